@@ -7,13 +7,189 @@ import logging
 import requests
 import urllib3
 import traceback
+import hashlib
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from wcferry import Wcf
 
+# websocket-client为可选依赖，仅WebSocket流式采集模式需要
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
 # 禁用SSL警告
 urllib3.disable_warnings()
 
+# Pump程序地址
+PUMP_PROGRAM = "6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ35MKDfgCcMKJ"
+
+# base58字母表，用于解码指令data
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+# Pump create指令: Anchor discriminator为sha256("global:create")前8字节，
+# 账户顺序为 mint, mint_authority, bonding_curve, associated_bonding_curve, global, mpl_token_metadata, metadata, user, ...
+PUMP_CREATE_DISCRIMINATOR = hashlib.sha256(b"global:create").digest()[:8]
+PUMP_CREATE_MINT_INDEX = 0
+PUMP_CREATE_USER_INDEX = 7
+PUMP_CREATE_LOG = "Program log: Instruction: Create"
+
+def b58decode(data):
+    """base58字符串解码为字节"""
+    num = 0
+    for char in data:
+        num = num * 58 + BASE58_INDEX[char]
+    body = num.to_bytes((num.bit_length() + 7) // 8, "big") if num else b""
+    return b"\0" * (len(data) - len(data.lstrip("1"))) + body
+
+def iter_instructions(tx):
+    """遍历交易的顶层指令和内部(CPI)指令"""
+    yield from tx["transaction"]["message"].get("instructions", [])
+    for inner in (tx.get("meta") or {}).get("innerInstructions") or []:
+        yield from inner.get("instructions", [])
+
+def decode_pump_creates(tx):
+    """解码交易中的Pump create指令，返回 [(mint, creator)]，失败的交易不返回"""
+    if "transaction" not in tx or "message" not in tx["transaction"]:
+        return []
+    if (tx.get("meta") or {}).get("err") is not None:
+        return []
+    
+    # 程序地址只能是静态账户；v0交易追加查找表加载的可写、只读账户
+    account_keys = tx["transaction"]["message"].get("accountKeys", [])
+    if PUMP_PROGRAM not in account_keys:
+        return []
+    program_index = account_keys.index(PUMP_PROGRAM)
+    loaded = (tx.get("meta") or {}).get("loadedAddresses") or {}
+    account_keys = account_keys + loaded.get("writable", []) + loaded.get("readonly", [])
+    
+    events = []
+    for ix in iter_instructions(tx):
+        accounts = ix.get("accounts", [])
+        if ix.get("programIdIndex") != program_index or len(accounts) <= PUMP_CREATE_USER_INDEX:
+            continue
+        try:
+            if b58decode(ix.get("data", ""))[:8] != PUMP_CREATE_DISCRIMINATOR:
+                continue
+            events.append((account_keys[accounts[PUMP_CREATE_MINT_INDEX]], account_keys[accounts[PUMP_CREATE_USER_INDEX]]))
+        except (KeyError, IndexError):
+            continue
+    return events
+
+class HttpClientPool:
+    """按主机复用的HTTP长连接池: 每个主机一个Session，连接池大小与并发数一致"""
+    def __init__(self, pool_size=8):
+        self.pool_size = pool_size
+        self.sessions = {}
+        self.lock = Lock()
+
+    def session(self, url):
+        """返回url所在主机的Session，首次访问时创建"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        session = self.sessions.get(host)
+        if session is None:
+            with self.lock:
+                session = self.sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self.sessions[host] = session
+        return session
+
+    def get(self, url, **kwargs):
+        return self.session(url).get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session(url).post(url, **kwargs)
+
+    def stats(self):
+        """返回各主机的 {requests: 请求数, connections: 新建连接数, reuse: 连接复用率}"""
+        stats = {}
+        for host, session in list(self.sessions.items()):
+            adapter = session.get_adapter(host)
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            requests_count = connections = 0
+            for manager in managers:
+                for key in list(manager.pools.keys()):
+                    pool = manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+            reuse = 1 - connections / requests_count if requests_count else 0
+            stats[host] = {"requests": requests_count, "connections": connections, "reuse": reuse}
+        return stats
+
+class TokenBucket:
+    """令牌桶限速器: 线程安全，线程和asyncio调用方均可等待，时钟可替换用于模拟
+    
+    采用预占方式: 令牌不足时余额为负，后来的调用方按顺序排在后面等待。
+    """
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _wait(self, now):
+        return max(0, self.updated - now) + max(0, -self.tokens) / self.rate
+
+    def reserve(self, tokens=1):
+        """预占令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= tokens
+            return self._wait(now)
+
+    def try_acquire(self, tokens=1):
+        """令牌充足时立即取走并返回True，否则不等待直接返回False"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            if self.updated > now or self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    def wait_time(self, tokens=1):
+        """返回取得令牌还需等待的秒数(不预占)"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            return max(0, self.updated - now) + max(0, tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """阻塞等待令牌，只阻塞当前调用方"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def penalize(self, seconds):
+        """节点返回429时暂停发放令牌seconds秒，由后续调用方各自等待"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0)
+            self.updated = max(self.updated, now + seconds)
+
 class TokenMonitor:
     def __init__(self):
         try:
@@ -23,25 +199,43 @@ class TokenMonitor:
             self.config = self.load_config()
             self.api_keys = self.config.get('api_keys', [])
             self.current_key = 0
-            self.request_counts = {}
-            self.last_reset = {}
             self.wcf = None
             self.watch_addresses = self.load_watch_addresses()
             self.init_wcf()
             
-            # 初始化API密钥计数器
-            for key in self.api_keys:
-                if key.strip():
-                    self.request_counts[key] = 0
-                    self.last_reset[key] = time.time()
+            # 每个API密钥一个令牌桶(每分钟100次)
+            self.key_limiters = {
+                key: TokenBucket(100 / 60, 100)
+                for key in self.api_keys if key.strip()
+            }
 
             # 创建线程池
             self.executor = ThreadPoolExecutor(max_workers=5)
             
+            # 最近处理过的新币，流式推送和断线补齐可能包含同一笔create交易
+            self.emitted_mints = OrderedDict()
+            self.emitted_lock = Lock()
+            
+            # 按主机复用的HTTP长连接池，连接数与线程池大小一致
+            self.http = HttpClientPool(pool_size=5)
+            
             # 缓存已分析的地址
             self.address_cache = {}
             self.cache_expire = 3600  # 缓存1小时过期
             
+            # 区块采集配置
+            self.ingest_config = {
+                'mode': 'poll',           # poll: 轮询getSlot/getBlock, logs: WebSocket流式采集
+                'ws_url': None,           # logs模式WebSocket地址(为空时由RPC地址推导)
+                'ws_idle_timeout': 30,    # logs模式无消息超过该秒数视为订阅断开
+                'checkpoint_file': '~/.solana_pump/checkpoint.json',  # 已处理slot检查点
+                'catchup_max_slots': 9000, # 重启后最多补采的slot数(约1小时)，更早的缺口直接跳过
+                'catchup_chunk': 50       # 每轮实时处理后补采的slot数
+            }
+            # 从配置文件加载采集设置
+            if 'ingest' in self.config:
+                self.ingest_config.update(self.config['ingest'])
+            
             # 初始化RPC节点管理
             self.init_rpc_nodes()
             
@@ -87,17 +281,18 @@ class TokenMonitor:
         # 请求限制配置
         self.request_limits = {
             "default": {
-                "requests_per_second": 5,
-                "min_interval": 0.2,    # 200ms最小间隔
+                "requests_per_second": 5,  # 令牌桶每秒补充的令牌数
+                "burst": 1,             # 令牌桶容量(允许的突发请求数)
                 "burst_wait": 15,       # 429错误后等待15秒
-                "current_requests": 0,
-                "last_request": 0
+                "max_batch": 10,        # JSON-RPC批量请求的最大条数(节点拒绝时自动缩小)
             }
         }
         
-        # 为每个节点初始化请求计数器
+        # 为每个节点初始化请求限制，令牌桶在首次请求时创建
         for node in self.rpc_nodes:
             self.request_limits[node] = self.request_limits["default"].copy()
+        self.rate_limiters = {}
+        self.rate_limiters_lock = Lock()
         
         self.current_rpc = None
         self.rpc_switch_interval = 60  # 60秒切换一次节点
@@ -115,6 +310,28 @@ class TokenMonitor:
             logging.error(f"详细错误: {traceback.format_exc()}")
             return {"api_keys": [], "serverchan": {"keys": []}, "wcf": {"groups": []}}
 
+    def load_checkpoint(self):
+        """读取已处理slot检查点"""
+        try:
+            with open(os.path.expanduser(self.ingest_config['checkpoint_file'])) as f:
+                return int(json.load(f)["slot"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+
+    def save_checkpoint(self, slot):
+        """原子写入已处理slot检查点"""
+        try:
+            path = os.path.expanduser(self.ingest_config['checkpoint_file'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"slot": slot, "updated": time.time()}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.error(f"保存slot检查点失败: {str(e)}")
+
     def load_watch_addresses(self):
         try:
             with open(self.watch_file) as f:
@@ -140,51 +357,40 @@ class TokenMonitor:
     def get_next_api_key(self):
         """获取下一个可用的API密钥"""
         try:
-            now = time.time()
-            for key in self.api_keys:
-                if not key.strip():
-                    continue
-                    
-                if now - self.last_reset[key] >= 60:
-                    self.request_counts[key] = 0
-                    self.last_reset[key] = now
-                
-                if self.request_counts[key] < 100:
-                    self.request_counts[key] += 1
+            if not self.key_limiters:
+                raise Exception("没有可用的API密钥")
+            
+            for key, limiter in self.key_limiters.items():
+                if limiter.try_acquire():
                     return key
             
-            raise Exception("所有API密钥已达到限制")
+            # 所有密钥都已用完本分钟额度，等待最早恢复的密钥
+            key = min(self.key_limiters, key=lambda k: self.key_limiters[k].wait_time())
+            self.key_limiters[key].acquire()
+            return key
         except Exception as e:
             logging.error(f"获取API密钥失败: {str(e)}")
             logging.error(f"详细错误: {traceback.format_exc()}")
             raise
 
-    def check_rate_limit(self, node):
-        """检查是否超出请求限制"""
-        current_time = time.time()
-        limits = self.request_limits.get(node, self.request_limits["default"])
-        
-        # 检查最小间隔
-        if current_time - limits["last_request"] < limits["min_interval"]:
-            time.sleep(limits["min_interval"])
-        
-        # 检查每秒请求数
-        if limits["current_requests"] >= limits["requests_per_second"]:
-            sleep_time = 1.0 - (current_time - limits["last_request"])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-            limits["current_requests"] = 0
-        
-        limits["current_requests"] += 1
-        limits["last_request"] = current_time
-        return True
+    def get_rate_limiter(self, node):
+        """返回节点的令牌桶，首次使用时按request_limits创建"""
+        limiter = self.rate_limiters.get(node)
+        if limiter is None:
+            with self.rate_limiters_lock:
+                limiter = self.rate_limiters.get(node)
+                if limiter is None:
+                    limits = self.request_limits.get(node, self.request_limits["default"])
+                    limiter = TokenBucket(limits["requests_per_second"], limits["burst"])
+                    self.rate_limiters[node] = limiter
+        return limiter
 
     def make_rpc_request(self, node, method, params=None):
         """发送RPC请求，带限制控制"""
         try:
-            self.check_rate_limit(node)
+            self.get_rate_limiter(node).acquire()
             
-            response = requests.post(
+            response = self.http.post(
                 node,
                 json={
                     "jsonrpc": "2.0",
@@ -198,7 +404,7 @@ class TokenMonitor:
             if response.status_code == 429:
                 # 触发限制，等待并切换节点
                 logging.warning(f"节点 {node} 触发请求限制")
-                time.sleep(self.request_limits[node]["burst_wait"])
+                self.get_rate_limiter(node).penalize(self.request_limits.get(node, self.request_limits["default"])["burst_wait"])
                 self.handle_rpc_error(node, "Rate limit exceeded")
                 return None
                 
@@ -208,6 +414,133 @@ class TokenMonitor:
             self.handle_rpc_error(node, str(e))
             return None
 
+    def make_batch_rpc_request(self, node, method, params_list):
+        """以JSON-RPC数组批量发送同一方法的请求，按id映射回请求序号，返回 {序号: 响应}"""
+        results = {}
+        if not params_list:
+            return results
+        
+        limits = self.request_limits.get(node, self.request_limits["default"])
+        batch_size = max(1, min(len(params_list), limits["max_batch"]))
+        indexes = list(range(len(params_list)))
+        
+        for start in range(0, len(indexes), batch_size):
+            self._send_rpc_batch(node, method, params_list, indexes[start:start + batch_size], results)
+        
+        return results
+
+    def _send_rpc_batch(self, node, method, params_list, indexes, results):
+        """发送一个批次，节点拒绝或截断大批次时对半拆分重试"""
+        limits = self.request_limits.get(node, self.request_limits["default"])
+        items = None
+        should_split = False
+        
+        try:
+            self.get_rate_limiter(node).acquire()
+            
+            response = self.http.post(
+                node,
+                json=[
+                    {
+                        "jsonrpc": "2.0",
+                        "id": i,
+                        "method": method,
+                        "params": params_list[i] or []
+                    }
+                    for i in indexes
+                ],
+                timeout=3 + 0.5 * len(indexes)
+            )
+            
+            if response.status_code == 429:
+                logging.warning(f"节点 {node} 触发请求限制")
+                self.get_rate_limiter(node).penalize(limits["burst_wait"])
+                self.handle_rpc_error(node, "Rate limit exceeded")
+                return
+            
+            if response.status_code == 200:
+                items = response.json()
+            # 413/400等状态或非数组响应说明节点不接受这么大的批次
+            should_split = not isinstance(items, list)
+            
+        except requests.exceptions.Timeout:
+            logging.warning(f"批量请求超时: {node} ({len(indexes)}条)")
+            should_split = True
+        except ValueError:
+            # 响应被截断导致JSON解析失败
+            should_split = True
+        except Exception as e:
+            self.handle_rpc_error(node, str(e))
+            return
+        
+        if isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict) and item.get("id") in indexes:
+                    results[item["id"]] = item
+        
+        missing = [i for i in indexes if i not in results]
+        if not missing:
+            # 整批成功，逐步恢复批次大小
+            if len(indexes) >= limits["max_batch"]:
+                limits["max_batch"] = min(self.request_limits["default"]["max_batch"], limits["max_batch"] + 1)
+            return
+        
+        if not (should_split or len(missing) < len(indexes)):
+            return
+        
+        if len(indexes) == 1:
+            # 节点不支持数组请求时退回单条请求
+            response = self.make_rpc_request(node, method, params_list[indexes[0]])
+            if response and response.status_code == 200:
+                try:
+                    results[indexes[0]] = response.json()
+                except ValueError:
+                    pass
+            return
+        
+        # 节点拒绝或截断了批次，缩小该节点的批次上限后重试缺失部分
+        limits["max_batch"] = max(1, len(indexes) // 2)
+        logging.info(f"节点 {node} 批次过大，批次上限调整为 {limits['max_batch']}")
+        
+        half = max(1, len(missing) // 2)
+        for part in (missing[:half], missing[half:]):
+            if part:
+                self._send_rpc_batch(node, method, params_list, part, results)
+
+    def fetch_blocks(self, node, slots, commitment=None):
+        """批量获取区块，返回 {slot: 响应}; commitment为空时使用节点默认的finalized"""
+        options = {"encoding":"json","transactionDetails":"full","maxSupportedTransactionVersion":0}
+        if commitment:
+            options["commitment"] = commitment
+        responses = self.make_batch_rpc_request(
+            node,
+            "getBlock",
+            [[slot, options] for slot in slots]
+        )
+        return {slots[i]: item for i, item in responses.items()}
+
+    def get_produced_slots(self, rpc, start_slot, end_slot, commitment=None):
+        """用getBlocks查询范围内实际出块的slot，返回 (出块slot列表, 已确认覆盖到的slot)
+        
+        被跳过的slot不会出现在结果中，查询失败时退回整个范围
+        """
+        if end_slot < start_slot:
+            return [], end_slot
+        
+        params = [start_slot, end_slot, {"commitment": commitment}] if commitment else [start_slot, end_slot]
+        response = self.make_rpc_request(rpc, "getBlocks", params)
+        try:
+            produced = response.json()["result"] if response else None
+        except (ValueError, KeyError):
+            produced = None
+        
+        if not isinstance(produced, list):
+            logging.warning(f"getBlocks查询失败，逐个获取slot {start_slot} - {end_slot}")
+            return list(range(start_slot, end_slot + 1)), end_slot
+        
+        # 最后一个出块slot之后的部分可能尚未确认，留到下一轮
+        return produced, produced[-1] if produced else start_slot - 1
+
     def get_best_rpc(self):
         """获取最佳RPC节点"""
         current_time = time.time()
@@ -279,7 +612,7 @@ class TokenMonitor:
             
             # 获取基本信息
             url = f"https://public-api.birdeye.so/public/token_metadata?address={mint}"
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = self.http.get(url, headers=headers, timeout=5)
             data = resp.json()
             
             if data.get("success"):
@@ -287,7 +620,7 @@ class TokenMonitor:
                 
                 # 获取持有人信息
                 holders_url = f"https://public-api.birdeye.so/public/token_holders?address={mint}"
-                holders_resp = requests.get(holders_url, headers=headers, timeout=5)
+                holders_resp = self.http.get(holders_url, headers=headers, timeout=5)
                 holders_data = holders_resp.json().get("data", [])
                 
                 # 计算持有人集中度
@@ -338,7 +671,7 @@ class TokenMonitor:
             
             headers = {"X-API-KEY": self.get_next_api_key()}
             url = f"https://public-api.birdeye.so/public/address_nft_mints?address={creator}"
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = self.http.get(url, headers=headers, timeout=5)
             data = resp.json()
             
             if data.get("success"):
@@ -351,7 +684,7 @@ class TokenMonitor:
                         max_market_cap = 0
                         try:
                             history_url = f"https://public-api.birdeye.so/public/token_price_history?address={tx['mint']}"
-                            history_resp = requests.get(history_url, headers=headers, timeout=5)
+                            history_resp = self.http.get(history_url, headers=headers, timeout=5)
                             if history_resp.status_code == 200:
                                 price_history = history_resp.json().get("data", [])
                                 if price_history:
@@ -395,7 +728,7 @@ class TokenMonitor:
             # 1. 分析转账历史
             headers = {"X-API-KEY": self.get_next_api_key()}
             url = f"https://public-api.birdeye.so/public/address_activity?address={creator}"
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = self.http.get(url, headers=headers, timeout=5)
             data = resp.json()
             
             if data.get("success"):
@@ -507,7 +840,7 @@ class TokenMonitor:
         """分析共同签名者（辅助函数）"""
         try:
             tx_url = f"https://public-api.solscan.io/account/transactions?account={address}"
-            tx_resp = requests.get(tx_url, timeout=5)
+            tx_resp = self.http.get(tx_url, timeout=5)
             tx_data = tx_resp.json()
             
             cosigner_relations = []
@@ -707,7 +1040,7 @@ class TokenMonitor:
         # Server酱推送
         for key in self.config["serverchan"]["keys"]:
             try:
-                response = requests.post(
+                response = self.http.post(
                     f"https://sctapi.ftqq.com/{key}.send",
                     data={"title": "Solana新代币提醒", "desp": msg},
                     timeout=5
@@ -730,14 +1063,208 @@ class TokenMonitor:
                     logging.error(f"WeChatFerry推送失败 ({group['name']}): {str(e)}")
                     logging.error(f"详细错误: {traceback.format_exc()}")
 
+    def process_transaction(self, tx):
+        """处理单笔交易，发现Pump新币创建时分析并推送，返回是否包含create指令"""
+        events = decode_pump_creates(tx)
+        for mint, creator in events:
+            if self.claim_mint(mint):
+                self.process_pump_create(mint, creator)
+        return bool(events)
+
+    def claim_mint(self, mint):
+        """登记要处理的新币，同一mint只处理一次"""
+        with self.emitted_lock:
+            if mint in self.emitted_mints:
+                return False
+            self.emitted_mints[mint] = time.time()
+            while len(self.emitted_mints) > 100000:
+                self.emitted_mints.popitem(last=False)
+        return True
+
+    def process_pump_create(self, mint, creator):
+        """分析新创建的Pump代币并推送"""
+        logging.info(f"发现Pump交易: creator={creator}, mint={mint}")
+        token_info = self.fetch_token_info(mint)
+        logging.info(f"代币信息: {json.dumps(token_info, indent=2)}")
+        
+        if token_info["market_cap"] < 1000:
+            logging.info(f"市值过小 (${token_info['market_cap']}), 跳过通知")
+            return
+        
+        history = self.analyze_creator_history(creator)
+        relations = self.analyze_creator_relations(creator)
+        
+        alert_data = {
+            "creator": creator,
+            "mint": mint,
+            "token_info": token_info,
+            "history": history,
+            "relations": relations
+        }
+        
+        alert_msg = self.format_alert_message(alert_data)
+        logging.info("\n" + alert_msg)
+        self.send_notification(alert_msg)
+
+    def process_slots(self, rpc, slots, last_slot, commitment=None):
+        """批量下载并处理区块，返回最后处理完成的slot"""
+        batch_size = self.request_limits.get(rpc, self.request_limits["default"])["max_batch"]
+        blocks = {}
+        
+        for index, slot in enumerate(slots):
+            # 以JSON-RPC批量请求预取后续区块
+            if slot not in blocks:
+                batch = slots[index:index + batch_size]
+                blocks = dict.fromkeys(batch)
+                blocks.update(self.fetch_blocks(rpc, batch, commitment))
+            
+            block_data = blocks.pop(slot)
+            if not block_data:
+                logging.warning(f"获取区块 {slot} 失败，可能是RPC节点问题")
+                continue
+                
+            block = block_data.get("result")
+            if not block:
+                logging.warning(f"区块 {slot} 返回为空")
+                continue
+                
+            if "transactions" not in block:
+                logging.warning(f"区块 {slot} 没有transactions字段")
+                continue
+            
+            total_txs = len(block["transactions"])
+            pump_txs = 0
+            
+            for tx in block["transactions"]:
+                try:
+                    if self.process_transaction(tx):
+                        pump_txs += 1
+                except Exception as e:
+                    logging.error(f"处理交易失败: {str(e)}")
+                    continue
+            
+            logging.info(f"区块 {slot} 处理完成: 总交易数={total_txs}, Pump交易数={pump_txs}")
+            last_slot = slot
+        
+        return last_slot
+
+    def get_ws_url(self, rpc):
+        """获取节点的WebSocket地址"""
+        if self.ingest_config['ws_url']:
+            return self.ingest_config['ws_url']
+        
+        ws_url = rpc.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        # 自建节点的WebSocket端口为8900
+        return ws_url.replace(":8899", ":8900")
+
+    def handle_stream_signature(self, rpc, signature):
+        """下载流式通知对应的交易并处理"""
+        try:
+            response = self.make_rpc_request(
+                rpc,
+                "getTransaction",
+                [signature, {"encoding":"json","commitment":"confirmed","maxSupportedTransactionVersion":0}]
+            )
+            tx = response.json().get("result") if response and response.status_code == 200 else None
+            if not tx:
+                logging.warning(f"获取交易 {signature} 失败")
+                return
+            
+            self.process_transaction(tx)
+        except Exception as e:
+            logging.error(f"处理流式交易 {signature} 失败: {str(e)}")
+
+    def monitor_logs(self):
+        """WebSocket流式采集: logsSubscribe订阅PUMP_PROGRAM，断线重连后通过getBlock补齐缺口"""
+        logging.info("WebSocket流式采集模式启动")
+        last_slot = 0
+        
+        while True:
+            ws = None
+            rpc = None
+            try:
+                rpc = self.get_best_rpc()
+                ws_url = self.get_ws_url(rpc)
+                ws = websocket.create_connection(ws_url, timeout=self.ingest_config['ws_idle_timeout'])
+                ws.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "logsSubscribe",
+                    "params": [{"mentions": [PUMP_PROGRAM]}, {"commitment": "confirmed"}]
+                }))
+                
+                subscription = json.loads(ws.recv()).get("result")
+                if subscription is None:
+                    raise Exception("logsSubscribe订阅失败")
+                logging.info(f"logsSubscribe订阅成功: {ws_url} (订阅ID: {subscription})")
+                
+                # 重连后补齐断线期间的区块: 订阅使用confirmed，缺口内的slot可能还没有finalized，
+                # 补齐也按confirmed查询; 新订阅已推送过的create交易由claim_mint去重
+                if last_slot:
+                    response = self.make_rpc_request(rpc, "getSlot", [{"commitment": "confirmed"}])
+                    if response:
+                        current_slot = response.json()["result"]
+                        logging.info(f"补齐断线期间的区块: {last_slot + 1} - {current_slot}")
+                        slots, _ = self.get_produced_slots(rpc, last_slot + 1, current_slot, commitment="confirmed")
+                        self.executor.submit(self.process_slots, rpc, slots, last_slot, "confirmed")
+                
+                while True:
+                    message = json.loads(ws.recv())
+                    if message.get("method") != "logsNotification":
+                        continue
+                    
+                    result = message["params"]["result"]
+                    last_slot = max(last_slot, result["context"]["slot"])
+                    # 只下载包含create指令日志的成功交易，买卖交易直接丢弃
+                    if result["value"].get("err") is None and PUMP_CREATE_LOG in (result["value"].get("logs") or []):
+                        self.executor.submit(self.handle_stream_signature, rpc, result["value"]["signature"])
+                        
+            except websocket.WebSocketTimeoutException:
+                logging.warning(f"WebSocket超过{self.ingest_config['ws_idle_timeout']}秒无消息，订阅可能已断开，重新连接")
+            except Exception as e:
+                logging.error(f"WebSocket流式采集错误: {str(e)}")
+                if rpc:
+                    self.handle_rpc_error(rpc, str(e))
+                time.sleep(1)
+            finally:
+                if ws:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+
+    def plan_catchup(self, current_slot):
+        """根据检查点规划重启后的补采范围，返回 (实时采集起点, 待补采slot列表)"""
+        resume_slot = self.load_checkpoint()
+        live_start = current_slot - 10
+        if not resume_slot or resume_slot >= live_start:
+            if not resume_slot:
+                logging.info("没有slot检查点，从最新slot开始采集")
+            return max(resume_slot, live_start), []
+        
+        catchup_start = max(resume_slot + 1, live_start - self.ingest_config['catchup_max_slots'] + 1)
+        if catchup_start > resume_slot + 1:
+            logging.warning(f"缺口超过补采预算，跳过slot {resume_slot + 1} - {catchup_start - 1}")
+        
+        slots, _ = self.get_produced_slots(self.get_best_rpc(), catchup_start, live_start)
+        logging.info(f"从检查点 {resume_slot} 恢复，补采 {len(slots)} 个slot")
+        return live_start, slots
+
     def monitor(self):
         """主监控函数"""
         logging.info("监控启动...")
         last_slot = 0
-        PUMP_PROGRAM = "6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ35MKDfgCcMKJ"
+        catchup_slots = []  # 待补采的slot(旧->新)，每轮在实时slot之后处理一段
+        saved_slot = 0
         retry_count = 0
         max_retries = 3
         
+        # WebSocket流式采集模式
+        if self.ingest_config['mode'] == 'logs':
+            if websocket is not None:
+                return self.monitor_logs()
+            logging.warning("未安装websocket-client，回退到轮询采集模式")
+        
         while True:
             try:
                 rpc = self.get_best_rpc()
@@ -748,73 +1275,25 @@ class TokenMonitor:
                     
                 current_slot = response.json()["result"]
                 if last_slot == 0:
-                    last_slot = current_slot - 10
+                    last_slot, catchup_slots = self.plan_catchup(current_slot)
                 
-                for slot in range(last_slot + 1, current_slot + 1):
-                    response = self.make_rpc_request(
-                        rpc, 
-                        "getBlock",
-                        [slot, {"encoding":"json","transactionDetails":"full"}]
-                    )
-                    
-                    if not response:
-                        logging.warning(f"获取区块 {slot} 失败，可能是RPC节点问题")
-                        continue
-                        
-                    block = response.json().get("result")
-                    if not block:
-                        logging.warning(f"区块 {slot} 返回为空")
-                        continue
-                        
-                    if "transactions" not in block:
-                        logging.warning(f"区块 {slot} 没有transactions字段")
-                        continue
-                    
-                    total_txs = len(block["transactions"])
-                    pump_txs = 0
-                    
-                    for tx in block["transactions"]:
-                        try:
-                            if "transaction" not in tx or "message" not in tx["transaction"]:
-                                continue
-                                
-                            account_keys = tx["transaction"]["message"].get("accountKeys", [])
-                            if PUMP_PROGRAM in account_keys:
-                                pump_txs += 1
-                                accounts = account_keys
-                                creator = accounts[0]
-                                mint = accounts[4]
-                                
-                                logging.info(f"发现Pump交易: creator={creator}, mint={mint}")
-                                token_info = self.fetch_token_info(mint)
-                                logging.info(f"代币信息: {json.dumps(token_info, indent=2)}")
-                                
-                                if token_info["market_cap"] < 1000:
-                                    logging.info(f"市值过小 (${token_info['market_cap']}), 跳过通知")
-                                    continue
-                                
-                                history = self.analyze_creator_history(creator)
-                                relations = self.analyze_creator_relations(creator)
-                                
-                                alert_data = {
-                                    "creator": creator,
-                                    "mint": mint,
-                                    "token_info": token_info,
-                                    "history": history,
-                                    "relations": relations
-                                }
-                                
-                                alert_msg = self.format_alert_message(alert_data)
-                                logging.info("\n" + alert_msg)
-                                self.send_notification(alert_msg)
-                                
-                        except Exception as e:
-                            logging.error(f"处理交易失败: {str(e)}")
-                            continue
-                    
-                    logging.info(f"区块 {slot} 处理完成: 总交易数={total_txs}, Pump交易数={pump_txs}")
-                    last_slot = slot
-                    time.sleep(0.2)  # 基本请求间隔
+                # 实时slot优先处理，只下载实际出块的slot
+                slots, covered_slot = self.get_produced_slots(rpc, last_slot + 1, current_slot)
+                last_slot = max(self.process_slots(rpc, slots, last_slot), covered_slot)
+                
+                # 再补采一段缺口
+                if catchup_slots:
+                    chunk = catchup_slots[:self.ingest_config['catchup_chunk']]
+                    del catchup_slots[:len(chunk)]
+                    self.process_slots(rpc, chunk, 0)
+                    if not catchup_slots:
+                        logging.info("补采完成")
+                
+                # 检查点为尚未补采的最早slot之前，没有缺口时为最新处理的slot
+                checkpoint = catchup_slots[0] - 1 if catchup_slots else last_slot
+                if checkpoint != saved_slot:
+                    self.save_checkpoint(checkpoint)
+                    saved_slot = checkpoint
                 
                 time.sleep(1)  # 主循环间隔
                 
@@ -7,15 +7,1889 @@ import logging
 import requests
 import urllib3
 import traceback
+from urllib.parse import urlsplit, urlencode
+from requests.adapters import HTTPAdapter
+import asyncio
+import socket
+import base64
+import hashlib
+import struct
+import itertools
+import bisect
+import multiprocessing
+import sqlite3
+from multiprocessing import shared_memory
+from collections import deque, OrderedDict
 from datetime import datetime, timezone, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from wcferry import Wcf
-from queue import Queue
-from threading import Thread
+from queue import Queue, PriorityQueue, Full, Empty
+from threading import Thread, Lock, Event, Condition, Semaphore, local
+
+# aiohttp为可选依赖，仅asyncio采集模式需要
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# websocket-client为可选依赖，仅WebSocket流式采集模式需要
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+# 高速JSON解码器为可选依赖，未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 # 禁用SSL警告
 urllib3.disable_warnings()
 
+# Pump程序地址
+PUMP_PROGRAM = "6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ35MKDfgCcMKJ"
+
+# base58字母表，用于解码指令data
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {char: index for index, char in enumerate(BASE58_ALPHABET)}
+
+# Pump create指令: Anchor discriminator为sha256("global:create")前8字节，
+# 账户顺序为 mint, mint_authority, bonding_curve, associated_bonding_curve, global, mpl_token_metadata, metadata, user, ...
+PUMP_CREATE_DISCRIMINATOR = hashlib.sha256(b"global:create").digest()[:8]
+PUMP_CREATE_MINT_INDEX = 0
+PUMP_CREATE_USER_INDEX = 7
+PUMP_CREATE_LOG = "Program log: Instruction: Create"
+
+def b58encode(data):
+    """字节编码为base58字符串"""
+    num = int.from_bytes(data, "big")
+    chars = []
+    while num:
+        num, rem = divmod(num, 58)
+        chars.append(BASE58_ALPHABET[rem])
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + "".join(reversed(chars))
+
+def b58decode(data):
+    """base58字符串解码为字节"""
+    num = 0
+    for char in data:
+        num = num * 58 + BASE58_INDEX[char]
+    body = num.to_bytes((num.bit_length() + 7) // 8, "big") if num else b""
+    return b"\0" * (len(data) - len(data.lstrip("1"))) + body
+
+# 地址查找表账户头部长度(类型、停用slot、最后扩展slot、起始下标、authority、填充)，之后每32字节一个地址
+LOOKUP_TABLE_META_SIZE = 56
+
+def parse_lookup_table(data):
+    """解析地址查找表账户数据，返回 (最后扩展slot, 地址列表)"""
+    last_extended_slot = struct.unpack_from("<Q", data, 12)[0]
+    addresses = [b58encode(data[i:i + 32]) for i in range(LOOKUP_TABLE_META_SIZE, len(data) - 31, 32)]
+    return last_extended_slot, addresses
+
+def resolve_account_keys(tx, resolver=None):
+    """返回交易的完整账户列表: 静态账户 + 查找表加载的可写账户 + 只读账户
+    
+    优先使用meta.loadedAddresses，没有时通过resolver(查找表地址, 需要的最大下标)解析查找表
+    """
+    message = tx["transaction"]["message"]
+    keys = list(message.get("accountKeys", []))
+    loaded = (tx.get("meta") or {}).get("loadedAddresses")
+    if loaded:
+        return keys + loaded.get("writable", []) + loaded.get("readonly", [])
+    
+    lookups = message.get("addressTableLookups") or []
+    if not lookups or resolver is None:
+        return keys
+    
+    writable, readonly = [], []
+    for lookup in lookups:
+        max_index = max(lookup["writableIndexes"] + lookup["readonlyIndexes"], default=-1)
+        addresses = resolver(lookup["accountKey"], max_index)
+        if addresses is None:
+            # 查找表解析失败时只使用静态账户
+            return keys
+        writable.extend(addresses[i] for i in lookup["writableIndexes"])
+        readonly.extend(addresses[i] for i in lookup["readonlyIndexes"])
+    return keys + writable + readonly
+
+class AddressLookupTableCache:
+    """地址查找表缓存: 按表地址缓存地址列表及其最后扩展slot
+    
+    查找表只会追加地址，交易需要的下标在缓存范围内时直接使用；
+    超出范围说明表在缓存之后被扩展过，此时才重新获取。
+    """
+    def __init__(self, fetch):
+        self.fetch = fetch          # fetch(表地址) -> 账户数据字节，失败时返回None
+        self.tables = {}            # 表地址 -> {"addresses", "last_extended_slot", "fetched_at"}
+        self.lock = Lock()
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0}
+
+    def resolve(self, table, max_index):
+        """返回查找表的地址列表，需要的下标不存在时返回None"""
+        entry = self.tables.get(table)
+        if entry and max_index < len(entry["addresses"]):
+            with self.lock:
+                self.stats["hits"] += 1
+            return entry["addresses"]
+        
+        data = self.fetch(table)
+        if data is None:
+            return None
+        
+        last_extended_slot, addresses = parse_lookup_table(data)
+        with self.lock:
+            self.stats["refreshes" if entry else "misses"] += 1
+            self.tables[table] = {
+                "addresses": addresses,
+                "last_extended_slot": last_extended_slot,
+                "fetched_at": time.time()
+            }
+        if entry:
+            logging.debug(f"查找表 {table} 已扩展(最后扩展slot {last_extended_slot})，重新缓存 {len(addresses)} 个地址")
+        return addresses if max_index < len(addresses) else None
+
+def iter_instructions(tx):
+    """遍历交易的顶层指令和内部(CPI)指令"""
+    yield from tx["transaction"]["message"].get("instructions", [])
+    for inner in (tx.get("meta") or {}).get("innerInstructions") or []:
+        yield from inner.get("instructions", [])
+
+def decode_pump_creates(tx, resolver=None):
+    """解码交易中的Pump create指令，返回 [(mint, creator)]，失败的交易不返回"""
+    if "transaction" not in tx or "message" not in tx["transaction"]:
+        return []
+    if (tx.get("meta") or {}).get("err") is not None:
+        return []
+    
+    # 程序地址只能是静态账户，不含Pump程序的交易无需解析查找表
+    static_keys = tx["transaction"]["message"].get("accountKeys", [])
+    if PUMP_PROGRAM not in static_keys:
+        return []
+    program_index = static_keys.index(PUMP_PROGRAM)
+    account_keys = resolve_account_keys(tx, resolver)
+    
+    events = []
+    for ix in iter_instructions(tx):
+        accounts = ix.get("accounts", [])
+        if ix.get("programIdIndex") != program_index or len(accounts) <= PUMP_CREATE_USER_INDEX:
+            continue
+        try:
+            if b58decode(ix.get("data", ""))[:8] != PUMP_CREATE_DISCRIMINATOR:
+                continue
+            events.append((account_keys[accounts[PUMP_CREATE_MINT_INDEX]], account_keys[accounts[PUMP_CREATE_USER_INDEX]]))
+        except (KeyError, IndexError):
+            continue
+    return events
+
+class ReplayWebSocketServer:
+    """本地WebSocket替身: 回放录制的logsNotification，并应答getTransaction/getSlot等HTTP RPC请求
+    
+    录制文件为JSONL，每行 {"t": 收到时间, "signature": 签名, "notification": 原始通知, "transaction": getTransaction结果}
+    """
+    WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, record_path, speed=1.0, host="127.0.0.1", port=0):
+        with open(record_path) as f:
+            self.records = sorted((json.loads(line) for line in f if line.strip()), key=lambda r: r["t"])
+        self.transactions = {r["signature"]: r["transaction"] for r in self.records}
+        self.speed = speed
+        self.sent_at = {}          # 签名 -> 通知发送时间
+        self.current_slot = 0
+        self.replay_done = Event()
+        self.connections = set()
+        
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(16)
+        port = self.sock.getsockname()[1]
+        self.url = f"ws://{host}:{port}"
+        self.http_url = f"http://{host}:{port}"
+
+    def start(self):
+        Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _read_headers(self, stream):
+        request_line = stream.readline().decode().strip()
+        if not request_line:
+            return None, None
+        headers = {}
+        while True:
+            line = stream.readline().decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    def _handle(self, conn):
+        self.connections.add(conn)
+        stream = conn.makefile("rb")
+        try:
+            while True:
+                request_line, headers = self._read_headers(stream)
+                if request_line is None:
+                    return
+                if headers.get("upgrade", "").lower() == "websocket":
+                    self._handle_websocket(conn, stream, headers)
+                    return
+                body = stream.read(int(headers.get("content-length", 0)))
+                self._handle_http(conn, json.loads(body) if body else {})
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.connections.discard(conn)
+            conn.close()
+
+    def _handle_http(self, conn, payload):
+        requests_list = payload if isinstance(payload, list) else [payload]
+        replies = []
+        for request in requests_list:
+            method = request.get("method")
+            params = request.get("params") or []
+            if method == "getTransaction":
+                result = self.transactions.get(params[0])
+            elif method == "getSlot":
+                result = self.current_slot
+            elif method == "getHealth":
+                result = "ok"
+            else:
+                result = None
+            replies.append({"jsonrpc": "2.0", "result": result, "id": request.get("id")})
+        
+        body = json.dumps(replies if isinstance(payload, list) else replies[0]).encode()
+        conn.sendall(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+
+    def _handle_websocket(self, conn, stream, headers):
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + self.WS_GUID).encode()).digest()
+        ).decode()
+        conn.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            + f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        
+        # 等待logsSubscribe请求并确认订阅
+        request = json.loads(self._recv_frame(stream))
+        subscription = 1
+        self._send_frame(conn, json.dumps({"jsonrpc": "2.0", "result": subscription, "id": request.get("id")}))
+        
+        # 按录制时的时间间隔回放通知
+        start = time.time()
+        first_t = self.records[0]["t"] if self.records else 0
+        for record in self.records:
+            delay = start + (record["t"] - first_t) / self.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            notification = dict(record["notification"])
+            notification["params"] = dict(notification["params"], subscription=subscription)
+            self.current_slot = max(self.current_slot, notification["params"]["result"]["context"]["slot"])
+            self.sent_at[record["signature"]] = time.time()
+            self._send_frame(conn, json.dumps(notification))
+        self.replay_done.set()
+        
+        # 保持连接直到客户端断开
+        while self._recv_frame(stream) is not None:
+            pass
+
+    def _recv_frame(self, stream):
+        header = stream.read(2)
+        if len(header) < 2 or header[0] & 0x0F == 0x8:
+            return None
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", stream.read(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", stream.read(8))[0]
+        mask = stream.read(4) if header[1] & 0x80 else b"\x00" * 4
+        payload = stream.read(length)
+        return bytes(b ^ mask[i % 4] for i, b in enumerate(payload)).decode()
+
+    def _send_frame(self, conn, text):
+        payload = text.encode()
+        if len(payload) < 126:
+            header = struct.pack(">BB", 0x81, len(payload))
+        elif len(payload) < 65536:
+            header = struct.pack(">BBH", 0x81, 126, len(payload))
+        else:
+            header = struct.pack(">BBQ", 0x81, 127, len(payload))
+        conn.sendall(header + payload)
+
+    def close(self):
+        """停止监听并断开所有客户端连接"""
+        self.sock.close()
+        for conn in list(self.connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+def benchmark_stream_replay(monitor, record_path, speed=1.0, timeout=60):
+    """用本地替身回放录制的通知，统计通知发出到事件入队的延迟"""
+    server = ReplayWebSocketServer(record_path, speed).start()
+    
+    # 录制的交易对应的mint -> 签名
+    expected = {}
+    for record in server.records:
+        for mint, _ in decode_pump_creates(record["transaction"]):
+            expected[mint] = record["signature"]
+    
+    # 保存会被临时修改的状态，结束后恢复
+    original = {
+        "result_queue": monitor.result_queue,
+        "ingest_config": dict(monitor.ingest_config),
+        "rpc_nodes": dict(monitor.rpc_nodes),
+        "request_limits": dict(monitor.request_limits),
+        "emitted_mints": monitor.emitted_mints
+    }
+    
+    # 使用独立的结果队列，避免与通知线程争抢; 回放的mint不计入去重记录
+    monitor.result_queue = Queue()
+    monitor.emitted_mints = OrderedDict()
+    monitor.ingest_config.update({"mode": "logs", "ws_url": server.url})
+    monitor.rpc_nodes[server.http_url] = {"weight": 1, "fails": 0, "last_used": 0}
+    monitor.request_limits[server.http_url] = dict(monitor.request_limits["default"], requests_per_second=10_000, burst=10_000)
+    monitor.probe_once()
+    stop = Event()
+    stream = Thread(target=monitor.monitor_logs, args=(stop,), daemon=True)
+    stream.start()
+    
+    latencies = []
+    deadline = time.time() + timeout
+    try:
+        while len(latencies) < len(expected) and time.time() < deadline:
+            try:
+                mint, _ = monitor.result_queue.get(timeout=0.5)
+            except Exception:
+                continue
+            signature = expected.get(mint)
+            if signature in server.sent_at:
+                latencies.append((time.time() - server.sent_at[signature]) * 1000)
+    finally:
+        stop.set()
+        server.close()
+        stream.join(timeout=5)
+        monitor.result_queue = original["result_queue"]
+        monitor.emitted_mints = original["emitted_mints"]
+        monitor.ingest_config.clear()
+        monitor.ingest_config.update(original["ingest_config"])
+        monitor.rpc_nodes.clear()
+        monitor.rpc_nodes.update(original["rpc_nodes"])
+        monitor.request_limits.clear()
+        monitor.request_limits.update(original["request_limits"])
+        with monitor.health_lock:
+            monitor.node_health.pop(server.http_url, None)
+        monitor.rank_nodes()
+    
+    if not latencies:
+        print("未收到任何回放事件")
+        return None
+    
+    latencies.sort()
+    stats = {
+        "events": len(latencies),
+        "expected": len(expected),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "max_ms": latencies[-1]
+    }
+    print(f"回放事件: {stats['events']}/{stats['expected']} | "
+          f"延迟 p50: {stats['p50_ms']:.1f}ms | p95: {stats['p95_ms']:.1f}ms | 最大: {stats['max_ms']:.1f}ms")
+    return stats
+
+class JsonDecoder:
+    """可插拔JSON解码器: 默认按 orjson > msgspec > json 选择已安装的最快实现"""
+    BACKENDS = ("orjson", "msgspec", "json")
+
+    def __init__(self, backend=None):
+        candidates = [backend] if backend else self.BACKENDS
+        for name in candidates:
+            loads = self._make_loads(name)
+            if loads:
+                self.name = name
+                self.loads = loads
+                break
+        else:
+            logging.warning(f"JSON解码器 {backend} 不可用，使用标准库json")
+            self.name = "json"
+            self.loads = json.loads
+        self._std_decoder = json.JSONDecoder()
+
+    @staticmethod
+    def _make_loads(name):
+        if name == "orjson" and orjson is not None:
+            return orjson.loads
+        if name == "msgspec" and msgspec is not None:
+            return msgspec.json.Decoder().decode
+        if name == "json":
+            # 标准库json不接受memoryview，共享内存中的记录先转为bytes
+            return lambda data: json.loads(bytes(data) if isinstance(data, memoryview) else data)
+        return None
+
+    @classmethod
+    def available_backends(cls):
+        return [name for name in cls.BACKENDS if cls._make_loads(name)]
+
+    def loads_prefix(self, data):
+        """解码以一个JSON对象开头的字节或memoryview(对象后可能跟随其他内容)"""
+        end = len(data)
+        while end and data[end - 1] in b", \t\r\n":
+            end -= 1
+        try:
+            return self.loads(data[:end])
+        except Exception:
+            obj, _ = self._std_decoder.raw_decode(bytes(data).decode())
+            return obj
+
+# 全局默认解码器
+JSON_DECODER = JsonDecoder()
+
+def benchmark_json_decoders(payload_dir, rounds=3):
+    """回放保存的getBlock响应，比较各解码器的吞吐(MB/s)和单区块延迟"""
+    payloads = []
+    for name in sorted(os.listdir(payload_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(payload_dir, name), "rb") as f:
+                payloads.append(f.read())
+    
+    if not payloads:
+        print(f"目录中没有区块样本: {payload_dir}")
+        return None
+    
+    total_mb = sum(len(p) for p in payloads) / 1024 / 1024
+    print(f"区块样本: {len(payloads)}个, 共 {total_mb:.1f}MB, 每个解码器 {rounds} 轮")
+    
+    results = {}
+    for backend in JsonDecoder.available_backends():
+        decoder = JsonDecoder(backend)
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for payload in payloads:
+                t = time.perf_counter()
+                decoder.loads(payload)
+                latencies.append((time.perf_counter() - t) * 1000)
+        elapsed = time.perf_counter() - start
+        
+        latencies.sort()
+        results[backend] = {
+            "mb_per_s": total_mb * rounds / elapsed if elapsed > 0 else 0,
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        }
+        print(f"{backend:<8} | {results[backend]['mb_per_s']:8.1f} MB/s | "
+              f"单区块 p50: {results[backend]['p50_ms']:.2f}ms | p95: {results[backend]['p95_ms']:.2f}ms")
+    
+    return results
+
+def save_block_samples(monitor, payload_dir, count=20):
+    """下载最近的区块原始响应，保存为解码基准测试样本"""
+    os.makedirs(payload_dir, exist_ok=True)
+    rpc = monitor.get_best_rpc()
+    response = monitor.make_rpc_request(rpc, "getSlot")
+    if not response:
+        print("获取最新slot失败")
+        return 0
+    
+    current_slot = response.json()["result"]
+    saved = 0
+    for slot in range(current_slot - count * 2, current_slot):
+        response = monitor.make_rpc_request(
+            rpc,
+            "getBlock",
+            [slot, {"encoding":"json","transactionDetails":"full","maxSupportedTransactionVersion":0}]
+        )
+        if response and response.status_code == 200 and response.content.startswith(RPC_RESULT_PREFIX):
+            with open(os.path.join(payload_dir, f"{slot}.json"), "wb") as f:
+                f.write(response.content)
+            saved += 1
+            if saved >= count:
+                break
+    
+    print(f"已保存 {saved} 个区块样本到 {payload_dir}")
+    return saved
+
+# 原始字节预过滤使用的标记
+PUMP_PROGRAM_BYTES = PUMP_PROGRAM.encode()
+RPC_RESPONSE_PREFIX = b'{"jsonrpc":"2.0",'
+RPC_RESULT_PREFIX = b'{"jsonrpc":"2.0","result":{'
+TX_START_MARKERS = (b'{"meta":', b'{"transaction":')
+
+def raw_or_decoded(content):
+    """区块结果保留原始字节交给预过滤，错误/空结果等小响应直接解码"""
+    content = content.strip()
+    if content.startswith(RPC_RESULT_PREFIX):
+        return content
+    return json.loads(content)
+
+def split_batch_response(raw):
+    """不解码地把JSON-RPC批量响应拆成 [(id, 原始字节或解码结果)]，格式不符时返回None"""
+    body = raw.strip()
+    if not body.startswith(b"[" + RPC_RESPONSE_PREFIX):
+        return None
+    
+    # 字符串内的引号会被转义，所以响应前缀只会出现在元素边界
+    starts = []
+    pos = 1
+    while pos != -1:
+        starts.append(pos)
+        pos = body.find(b"," + RPC_RESPONSE_PREFIX, pos)
+        if pos != -1:
+            pos += 1
+    
+    pairs = []
+    try:
+        for i, start in enumerate(starts):
+            end = starts[i + 1] - 1 if i + 1 < len(starts) else len(body) - 1
+            element = body[start:end].rstrip()
+            id_pos = element.rfind(b'"id":')
+            pairs.append((int(element[id_pos + 5:-1]), raw_or_decoded(element)))
+    except ValueError:
+        return None
+    return pairs
+
+def extract_block_events(raw, decoder=None, resolver=None):
+    """从getBlock原始响应字节中提取Pump事件，返回 (事件列表, 实际解码的字节数)
+    
+    不含PUMP_PROGRAM的区块完全不解码; 命中的区块只解码包含该地址的交易。
+    """
+    if PUMP_PROGRAM_BYTES not in raw:
+        return [], 0
+    
+    decoder = decoder or JSON_DECODER
+    events = []
+    decoded_bytes = 0
+    pos = raw.find(PUMP_PROGRAM_BYTES)
+    
+    while pos != -1:
+        # 定位包含命中位置的交易对象
+        start = max(raw.rfind(marker, 0, pos) for marker in TX_START_MARKERS)
+        next_starts = [i for i in (raw.find(marker, pos) for marker in TX_START_MARKERS) if i != -1]
+        end = min(next_starts) if next_starts else len(raw)
+        
+        tx = None
+        if start != -1:
+            try:
+                tx = decoder.loads_prefix(raw[start:end])
+            except ValueError:
+                tx = None
+        
+        if not isinstance(tx, dict) or "transaction" not in tx:
+            # 响应结构不符合预期，退回完整解码
+            data = decoder.loads(raw[:])
+            block = data.get("result") or {}
+            events = [event for tx in block.get("transactions", []) for event in decode_pump_creates(tx, resolver)]
+            return events, len(raw)
+        
+        events.extend(decode_pump_creates(tx, resolver))
+        decoded_bytes += end - start
+        pos = raw.find(PUMP_PROGRAM_BYTES, end)
+    
+    return events, decoded_bytes
+
+# 共享内存环形缓冲区布局: 头部为写入/读取/回收三个单调递增的逻辑位置，
+# 每条记录前有 (长度, 状态) 记录头，记录按8字节对齐
+RING_HEADER = struct.Struct("<QQQ")
+RING_RECORD = struct.Struct("<II")
+RING_WRAP = 0xFFFFFFFF          # 尾部空间不足时写入的回绕标记
+RECORD_WRITING, RECORD_READY, RECORD_CLAIMED, RECORD_RELEASED = range(4)
+
+class SharedRingBuffer:
+    """固定大小的共享内存环形缓冲区，在进程间传递区块原始字节和紧凑事件记录
+    
+    生产者空间不足时阻塞(背压); 消费者通过memoryview零拷贝读取，用完后release释放。
+    记录可以乱序释放，空间按写入顺序回收。put写入的记录由get按顺序取出，
+    write写入的记录不进入get队列，由持有位置的一方通过view直接读取。
+    """
+    def __init__(self, capacity, context=None, handle=None):
+        if handle:
+            # 附加到其他进程创建的缓冲区
+            name, self.capacity, self.cond = handle
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        else:
+            self.capacity = (capacity + 7) // 8 * 8
+            self.cond = (context or multiprocessing).Condition()
+            self.shm = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + self.capacity)
+            self.owner = True
+            RING_HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        self.data = self.shm.buf[RING_HEADER.size:]
+
+    def handle(self):
+        """传给子进程(Process参数或进程池initargs)用于附加的句柄"""
+        return self.shm.name, self.capacity, self.cond
+
+    def record_size(self, length):
+        return (RING_RECORD.size + length + 7) // 8 * 8
+
+    def _positions(self):
+        return RING_HEADER.unpack_from(self.shm.buf, 0)
+
+    def _store(self, write_pos, read_pos, free_pos):
+        RING_HEADER.pack_into(self.shm.buf, 0, write_pos, read_pos, free_pos)
+
+    def _reserve(self, length, timeout):
+        """预留一条记录的空间，空间不足时等待，返回记录的逻辑位置"""
+        size = self.record_size(length)
+        if size > self.capacity:
+            raise ValueError(f"记录大小 {length} 超过环形缓冲区容量 {self.capacity}")
+        
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while True:
+                write_pos, read_pos, free_pos = self._positions()
+                offset = write_pos % self.capacity
+                tail = self.capacity - offset
+                if write_pos == free_pos and size > tail:
+                    # 缓冲区为空时直接跳到开头，避免回绕标记和记录重叠
+                    write_pos = read_pos = free_pos = write_pos + tail
+                    self._store(write_pos, read_pos, free_pos)
+                    offset, tail = 0, self.capacity
+                needed = size if size <= tail else tail + size
+                if write_pos + needed - free_pos <= self.capacity:
+                    break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise Full
+                self.cond.wait(remaining)
+            
+            if size > tail:
+                # 尾部放不下，写回绕标记后从头开始
+                RING_RECORD.pack_into(self.data, offset, RING_WRAP, RECORD_RELEASED)
+                write_pos += tail
+                offset = 0
+            RING_RECORD.pack_into(self.data, offset, length, RECORD_WRITING)
+            self._store(write_pos + size, read_pos, free_pos)
+            return write_pos
+
+    def _set_state(self, pos, state):
+        length, _ = RING_RECORD.unpack_from(self.data, pos % self.capacity)
+        RING_RECORD.pack_into(self.data, pos % self.capacity, length, state)
+
+    def _write(self, data, state, timeout):
+        length = len(data)
+        pos = self._reserve(length, timeout)
+        # 数据拷贝在锁外进行，不阻塞其他生产者和消费者
+        offset = pos % self.capacity + RING_RECORD.size
+        self.data[offset:offset + length] = data
+        with self.cond:
+            self._set_state(pos, state)
+            self.cond.notify_all()
+        return pos
+
+    def put(self, data, timeout=None):
+        """写入一条记录，等待get取出; 超时仍无空间时抛出queue.Full"""
+        return self._write(data, RECORD_READY, timeout)
+
+    def write(self, data, timeout=None):
+        """写入一条直接寻址的记录，返回位置，由读取方通过view读取"""
+        return self._write(data, RECORD_CLAIMED, timeout)
+
+    def view(self, pos):
+        """返回记录内容的memoryview(零拷贝)"""
+        offset = pos % self.capacity
+        length, _ = RING_RECORD.unpack_from(self.data, offset)
+        return self.data[offset + RING_RECORD.size:offset + RING_RECORD.size + length]
+
+    def record(self, pos):
+        """返回记录的RingRecord，可以像bytes一样查找和切片，全程不拷贝"""
+        offset = pos % self.capacity
+        length, _ = RING_RECORD.unpack_from(self.data, offset)
+        # shm.buf的memoryview没有find/rfind，查找直接在底层mmap上进行
+        return RingRecord(self.shm._mmap, RING_HEADER.size + offset + RING_RECORD.size, self.view(pos))
+
+    def get(self, timeout=None):
+        """按写入顺序取出一条记录，返回 (位置, memoryview); 超时抛出queue.Empty"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while True:
+                write_pos, read_pos, free_pos = self._positions()
+                while read_pos < write_pos:
+                    offset = read_pos % self.capacity
+                    length, state = RING_RECORD.unpack_from(self.data, offset)
+                    if length == RING_WRAP:
+                        read_pos += self.capacity - offset
+                    elif state == RECORD_READY:
+                        RING_RECORD.pack_into(self.data, offset, length, RECORD_CLAIMED)
+                        self._store(write_pos, read_pos + self.record_size(length), free_pos)
+                        return read_pos, self.view(read_pos)
+                    elif state == RECORD_WRITING:
+                        break
+                    else:
+                        # 直接寻址的记录不经过get
+                        read_pos += self.record_size(length)
+                self._store(write_pos, read_pos, free_pos)
+                
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise Empty
+                self.cond.wait(remaining)
+
+    def release(self, pos):
+        """释放记录，按写入顺序回收连续已释放的空间并唤醒等待的生产者"""
+        with self.cond:
+            self._set_state(pos, RECORD_RELEASED)
+            write_pos, read_pos, free_pos = self._positions()
+            while free_pos < write_pos:
+                offset = free_pos % self.capacity
+                length, state = RING_RECORD.unpack_from(self.data, offset)
+                if length == RING_WRAP:
+                    free_pos += self.capacity - offset
+                elif state == RECORD_RELEASED:
+                    free_pos += self.record_size(length)
+                else:
+                    break
+            self._store(write_pos, max(read_pos, free_pos), free_pos)
+            self.cond.notify_all()
+
+    def used(self):
+        """已占用的字节数(含未回收的记录)"""
+        write_pos, _, free_pos = self._positions()
+        return write_pos - free_pos
+
+    def close(self):
+        self.data.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class RingRecord:
+    """环形缓冲区中一条记录的只读视图，提供extract_block_events用到的bytes接口
+    
+    in/find/rfind在共享内存的mmap上查找，切片返回memoryview，交给orjson/msgspec直接解码。
+    """
+    def __init__(self, mm, base, view):
+        self.mm = mm
+        self.base = base
+        self.view = view
+
+    def __len__(self):
+        return len(self.view)
+
+    def __getitem__(self, index):
+        return self.view[index]
+
+    def __contains__(self, sub):
+        return self.find(sub) != -1
+
+    def _locate(self, method, sub, start, end):
+        end = len(self.view) if end is None else min(end, len(self.view))
+        pos = method(sub, self.base + start, self.base + end)
+        return -1 if pos == -1 else pos - self.base
+
+    def find(self, sub, start=0, end=None):
+        return self._locate(self.mm.find, sub, start, end)
+
+    def rfind(self, sub, start=0, end=None):
+        return self._locate(self.mm.rfind, sub, start, end)
+
+    def release(self):
+        self.view.release()
+
+def pack_events(events):
+    """把 [(mint, creator)] 编码为紧凑记录: 每个地址为1字节长度 + 原始字节"""
+    out = bytearray()
+    for mint, creator in events:
+        for address in (mint, creator):
+            raw = b58decode(address)
+            out.append(len(raw))
+            out += raw
+    return bytes(out)
+
+def unpack_events(data):
+    """解码pack_events生成的事件记录"""
+    events, addresses, pos = [], [], 0
+    while pos < len(data):
+        length = data[pos]
+        addresses.append(b58encode(bytes(data[pos + 1:pos + 1 + length])))
+        pos += 1 + length
+        if len(addresses) == 2:
+            events.append(tuple(addresses))
+            addresses = []
+    return events
+
+# 解码进程内按后端缓存的解码器
+_WORKER_DECODERS = {}
+
+def decode_block_in_worker(raw, backend=None):
+    """解码进程入口: 预过滤并解码区块，只返回紧凑的Pump事件
+
+    返回 (pack_events事件记录, 实际解码的字节数, 是否有未解析的查找表)。
+    查找表缓存只在主进程中，需要查找表的交易由主进程重新解码。
+    """
+    decoder = _WORKER_DECODERS.get(backend)
+    if decoder is None:
+        decoder = _WORKER_DECODERS[backend] = JsonDecoder(backend)
+
+    unresolved = []
+    def resolver(table, max_index):
+        unresolved.append(table)
+        return None
+
+    events, decoded_bytes = extract_block_events(raw, decoder, resolver)
+    return pack_events(events), decoded_bytes, bool(unresolved)
+
+# 解码进程附加的共享内存环形缓冲区
+_WORKER_RING = None
+
+def attach_decode_ring(handle):
+    """解码进程初始化: 附加到主进程创建的环形缓冲区"""
+    global _WORKER_RING
+    _WORKER_RING = SharedRingBuffer(0, handle=handle)
+
+def decode_ring_record(pos, backend=None):
+    """解码进程入口: 从环形缓冲区读取区块，返回值同decode_block_in_worker"""
+    record = _WORKER_RING.record(pos)
+    try:
+        # 直接在共享内存上查找和解码，不把区块拷贝到工作进程
+        return decode_block_in_worker(record, backend)
+    finally:
+        record.release()
+
+def get_process_context():
+    """子进程启动方式: 主进程已有多个线程，fork可能继承被占用的锁，优先使用forkserver"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def create_decode_pool(processes, ring=None):
+    """创建区块解码进程池，processes为0时不启用; 传入ring时工作进程附加到该环形缓冲区"""
+    if processes <= 0:
+        return None
+    if ring:
+        return ProcessPoolExecutor(max_workers=processes, mp_context=get_process_context(),
+                                   initializer=attach_decode_ring, initargs=(ring.handle(),))
+    return ProcessPoolExecutor(max_workers=processes, mp_context=get_process_context())
+
+def benchmark_decode_pool(payload_dir, rounds=3, backend=None):
+    """回放保存的getBlock响应，比较不同解码进程数下的吞吐(MB/s)"""
+    payloads = []
+    for name in sorted(os.listdir(payload_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(payload_dir, name), "rb") as f:
+                payloads.append(f.read())
+
+    if not payloads:
+        print(f"目录中没有区块样本: {payload_dir}")
+        return None
+
+    total_mb = sum(len(p) for p in payloads) / 1024 / 1024 * rounds
+    cpu = os.cpu_count() or 1
+    counts = sorted({0, 1, 2, 4, cpu} & set(range(cpu + 1)))
+
+    results = {}
+    for processes in counts:
+        pool = create_decode_pool(processes)
+        try:
+            if pool:
+                # 预热: 启动全部工作进程
+                list(pool.map(decode_block_in_worker, payloads[:processes], [backend] * min(processes, len(payloads))))
+            start = time.perf_counter()
+            for _ in range(rounds):
+                if pool:
+                    list(pool.map(decode_block_in_worker, payloads, [backend] * len(payloads)))
+                else:
+                    for payload in payloads:
+                        decode_block_in_worker(payload, backend)
+            elapsed = time.perf_counter() - start
+        finally:
+            if pool:
+                pool.shutdown()
+
+        results[processes] = total_mb / elapsed if elapsed > 0 else 0
+        label = f"{processes}进程" if processes else "主线程"
+        print(f"{label:<6} | {results[processes]:8.1f} MB/s")
+
+    return results
+
+def _queue_consumer(queue, count, done):
+    """基准测试消费进程: 从multiprocessing.Queue读取"""
+    for _ in range(count):
+        payload = queue.get()
+        payload[-1]
+    done.set()
+
+def _ring_consumer(handle, count, done):
+    """基准测试消费进程: 从环形缓冲区零拷贝读取"""
+    ring = SharedRingBuffer(0, handle=handle)
+    for _ in range(count):
+        pos, view = ring.get()
+        view[-1]
+        view.release()
+        ring.release(pos)
+    ring.close()
+    done.set()
+
+def benchmark_ring_buffer(sizes_mb=(1, 4, 16), total_mb=256, ring_mb=64):
+    """比较multiprocessing.Queue和共享内存环形缓冲区在跨进程传递区块时的吞吐"""
+    context = get_process_context()
+    results = {}
+    print(f"每种大小传输 {total_mb}MB, 环形缓冲区 {ring_mb}MB")
+    
+    for size_mb in sizes_mb:
+        payload = os.urandom(size_mb * 1024 * 1024)
+        count = max(4, total_mb // size_mb)
+        results[size_mb] = {}
+        
+        # Queue: 每个区块pickle后经管道传输
+        queue, done = context.Queue(maxsize=4), context.Event()
+        consumer = context.Process(target=_queue_consumer, args=(queue, count, done))
+        consumer.start()
+        start = time.perf_counter()
+        for _ in range(count):
+            queue.put(payload)
+        done.wait()
+        results[size_mb]["queue"] = size_mb * count / (time.perf_counter() - start)
+        consumer.join()
+        
+        # 环形缓冲区: 写入共享内存，空间不足时阻塞
+        ring, done = SharedRingBuffer(ring_mb * 1024 * 1024, context), context.Event()
+        consumer = context.Process(target=_ring_consumer, args=(ring.handle(), count, done))
+        consumer.start()
+        start = time.perf_counter()
+        for _ in range(count):
+            ring.put(payload)
+        done.wait()
+        results[size_mb]["ring"] = size_mb * count / (time.perf_counter() - start)
+        consumer.join()
+        ring.close()
+        
+        print(f"{size_mb:>3}MB 区块 | Queue: {results[size_mb]['queue']:8.1f} MB/s | "
+              f"环形缓冲区: {results[size_mb]['ring']:8.1f} MB/s | "
+              f"{results[size_mb]['ring'] / results[size_mb]['queue']:.1f}x")
+    
+    return results
+
+class SlotCheckpoint:
+    """slot检查点: 跟踪在途slot，原子持久化已完整处理的最高连续slot(低水位)
+    
+    获取失败、交给重试的slot不阻塞低水位，其缺口区间与低水位一起保存，重启后恢复重试。
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.lock = Lock()
+        self.outstanding = set()
+        self.saved_slot, self.saved_gaps = self.load()
+        self.max_slot = self.saved_slot
+        self.last_save = 0
+
+    def load(self):
+        """返回 (低水位slot, 缺口区间列表[[起始, 结束, 失败次数]])"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            gaps = [[int(start), int(end), int(attempts)] for start, end, attempts in data.get("gaps", [])]
+            return int(data["slot"]), gaps
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0, []
+
+    def begin(self, slots):
+        """登记开始处理的slot"""
+        if not slots:
+            return
+        with self.lock:
+            self.outstanding.update(slots)
+            self.max_slot = max(self.max_slot, max(slots))
+
+    def advance(self, slot):
+        """确认slot及之前的范围已覆盖(其中被跳过的slot无需处理)"""
+        with self.lock:
+            self.max_slot = max(self.max_slot, slot)
+
+    def done(self, slot):
+        """标记slot已处理完成(或已交给重试，缺口随检查点另行保存)"""
+        with self.lock:
+            self.outstanding.discard(slot)
+
+    @property
+    def watermark(self):
+        with self.lock:
+            return min(self.outstanding) - 1 if self.outstanding else self.max_slot
+
+    def save(self, interval=0, gaps=None):
+        """原子写入低水位和待重试的缺口区间，interval秒内不重复写入"""
+        now = time.time()
+        slot = self.watermark
+        gaps = gaps or []
+        if (slot == self.saved_slot and gaps == self.saved_gaps) or now - self.last_save < interval:
+            return
+        
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"slot": slot, "gaps": gaps, "updated": now}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.saved_slot = slot
+            self.saved_gaps = gaps
+            self.last_save = now
+        except Exception as e:
+            logging.error(f"保存slot检查点失败: {str(e)}")
+
+# slot被跳过/长期存储中缺失的RPC错误码，这些slot永远不会有区块
+SKIPPED_SLOT_ERRORS = (-32007, -32009)
+
+# getBlocks单次查询允许的最大slot范围
+GET_BLOCKS_MAX_RANGE = 500000
+
+def is_skipped_slot_error(response):
+    """判断getBlock响应是否为slot被跳过的错误"""
+    return isinstance(response, dict) and (response.get("error") or {}).get("code") in SKIPPED_SLOT_ERRORS
+
+class SlotGapTracker:
+    """丢失slot跟踪: 以区间保存缺口，按区间记录重试次数并指数退避
+    
+    区间为 [起始slot, 结束slot, 已失败次数, 下次重试时间]，按起始slot排序；
+    相邻且失败次数相同的slot合并为一个区间，长时间断线后内存只与区间数相关。
+    """
+    def __init__(self, max_slots=50000, max_attempts=8, base_delay=1, max_delay=300):
+        self.intervals = []
+        self.lock = Lock()
+        self.max_slots = max_slots
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.total = 0
+        self.stats = {'recovered': 0, 'skipped': 0, 'abandoned': 0, 'dropped': 0}
+
+    def __len__(self):
+        return self.total
+
+    def _find(self, slot):
+        """返回包含slot的区间下标，不存在时返回None"""
+        index = bisect.bisect_right(self.intervals, [slot, float('inf')]) - 1
+        if index >= 0 and self.intervals[index][1] >= slot:
+            return index
+        return None
+
+    def _remove_at(self, index, slot):
+        """从第index个区间中移除slot，必要时拆分区间"""
+        start, end, attempts, next_retry = self.intervals[index]
+        if start == end:
+            del self.intervals[index]
+        elif slot == start:
+            self.intervals[index][0] = start + 1
+        elif slot == end:
+            self.intervals[index][1] = end - 1
+        else:
+            self.intervals[index][1] = slot - 1
+            self.intervals.insert(index + 1, [slot + 1, end, attempts, next_retry])
+        self.total -= 1
+
+    def _insert(self, slot, attempts, next_retry):
+        """插入单个slot，与失败次数相同的相邻区间合并"""
+        index = bisect.bisect_right(self.intervals, [slot, float('inf')])
+        left = self.intervals[index - 1] if index > 0 else None
+        right = self.intervals[index] if index < len(self.intervals) else None
+        
+        if left and left[1] == slot - 1 and left[2] == attempts:
+            left[1] = slot
+            left[3] = max(left[3], next_retry)
+            if right and right[0] == slot + 1 and right[2] == attempts:
+                left[1] = right[1]
+                left[3] = max(left[3], right[3])
+                del self.intervals[index]
+        elif right and right[0] == slot + 1 and right[2] == attempts:
+            right[0] = slot
+            right[3] = max(right[3], next_retry)
+        else:
+            self.intervals.insert(index, [slot, slot, attempts, next_retry])
+        self.total += 1
+
+    def add(self, slot):
+        """记录一次失败: 新slot加入缺口，已有slot增加失败次数并延长退避"""
+        with self.lock:
+            attempts = 1
+            index = self._find(slot)
+            if index is not None:
+                attempts = self.intervals[index][2] + 1
+                self._remove_at(index, slot)
+            
+            if attempts > self.max_attempts:
+                self.stats['abandoned'] += 1
+                logging.warning(f"区块 {slot} 重试 {self.max_attempts} 次仍失败，放弃")
+                return
+            
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            self._insert(slot, attempts, time.time() + delay)
+            
+            # 超过上限时丢弃最旧的缺口，保证内存有界
+            while self.total > self.max_slots:
+                start, end = self.intervals[0][:2]
+                drop = min(end - start + 1, self.total - self.max_slots)
+                self.intervals[0][0] += drop
+                if self.intervals[0][0] > end:
+                    del self.intervals[0]
+                self.total -= drop
+                self.stats['dropped'] += drop
+
+    def snapshot(self):
+        """返回缺口区间 [[起始, 结束, 失败次数]]，用于随检查点持久化"""
+        with self.lock:
+            return [[start, end, attempts] for start, end, attempts, _ in self.intervals]
+
+    def restore(self, intervals):
+        """启动时恢复检查点中保存的缺口区间，全部立即可重试"""
+        now = time.time()
+        with self.lock:
+            self.intervals = sorted([start, end, attempts, now] for start, end, attempts in intervals)
+            self.total = sum(end - start + 1 for start, end, _, _ in self.intervals)
+
+    def resolve(self, slot):
+        """slot获取成功，从缺口中移除"""
+        with self.lock:
+            index = self._find(slot)
+            if index is not None:
+                self._remove_at(index, slot)
+                self.stats['recovered'] += 1
+
+    def mark_skipped(self, slot):
+        """slot被跳过(没有区块)，从缺口中移除且不再重试"""
+        with self.lock:
+            index = self._find(slot)
+            if index is not None:
+                self._remove_at(index, slot)
+            self.stats['skipped'] += 1
+
+    def count_skipped(self, count):
+        """记录通过getBlocks得知而未请求的跳过slot数"""
+        with self.lock:
+            self.stats['skipped'] += count
+
+    def due(self, limit):
+        """返回最多limit个已到重试时间的slot，优先最新的缺口"""
+        now = time.time()
+        slots = []
+        with self.lock:
+            for start, end, _, next_retry in reversed(self.intervals):
+                if next_retry > now:
+                    continue
+                take = min(end - start + 1, limit - len(slots))
+                slots.extend(range(end - take + 1, end + 1))
+                if len(slots) >= limit:
+                    break
+        return slots
+
+class LatencyStats:
+    """按节点保存最近的请求延迟样本，用于计算对冲请求的等待阈值"""
+    def __init__(self, window=200):
+        self.samples = {}
+        self.window = window
+        self.lock = Lock()
+
+    def record(self, node, seconds):
+        with self.lock:
+            if node not in self.samples:
+                self.samples[node] = deque(maxlen=self.window)
+            self.samples[node].append(seconds)
+
+    def percentile(self, node, pct, default=None, min_samples=20):
+        """返回节点延迟的pct分位数(秒)，样本不足时返回default"""
+        with self.lock:
+            samples = sorted(self.samples.get(node, ()))
+        if len(samples) < min_samples:
+            return default
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+class HttpClientPool:
+    """按主机复用的HTTP长连接池: 每个主机一个Session，连接池大小与并发数一致"""
+    def __init__(self, pool_size=8):
+        self.pool_size = pool_size
+        self.sessions = {}
+        self.lock = Lock()
+        self.last_totals = {}   # 主机 -> (累计请求数, 累计新建连接数)，stats()据此计算增量
+
+    def session(self, url):
+        """返回url所在主机的Session，首次访问时创建"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        session = self.sessions.get(host)
+        if session is None:
+            with self.lock:
+                session = self.sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self.sessions[host] = session
+        return session
+
+    def get(self, url, **kwargs):
+        return self.session(url).get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session(url).post(url, **kwargs)
+
+    def stats(self):
+        """返回各主机自上次调用以来的 {requests: 请求数, connections: 新建连接数, reuse: 连接复用率}"""
+        stats = {}
+        for host, session in list(self.sessions.items()):
+            adapter = session.get_adapter(host)
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            requests_count = connections = 0
+            for manager in managers:
+                for key in list(manager.pools.keys()):
+                    pool = manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+            last_requests, last_connections = self.last_totals.get(host, (0, 0))
+            self.last_totals[host] = (requests_count, connections)
+            # 连接池被回收时累计值会变小，此时按0计
+            requests_count = max(0, requests_count - last_requests)
+            connections = max(0, connections - last_connections)
+            reuse = 1 - connections / requests_count if requests_count else 0
+            stats[host] = {"requests": requests_count, "connections": connections, "reuse": reuse}
+        return stats
+
+class SingleFlight:
+    """在途请求合并: 同一个key已有请求在执行时，后来的调用者等待并共享它的结果"""
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}     # (命名空间, key) -> {"done", "result", "error"}
+        self.stats = {}     # 命名空间 -> {"calls": 实际执行次数, "shared": 共享结果次数, "cached": 取得执行权后命中缓存次数}
+
+    def in_flight(self, namespace, key):
+        with self.lock:
+            return (namespace, key) in self.calls
+
+    def do(self, namespace, key, fn, *args, check=None):
+        """执行fn(*args)，相同(命名空间, key)的并发调用只执行一次
+        
+        check(*args)用于在取得执行权后重新查询缓存: 调用方查缓存未命中之后、取得执行权之前，
+        上一个执行者可能刚好写入了结果，此时check返回非None的值直接使用，不再执行fn。
+        """
+        with self.lock:
+            stats = self.stats.setdefault(namespace, {"calls": 0, "shared": 0, "cached": 0})
+            call = self.calls.get((namespace, key))
+            leader = call is None
+            if leader:
+                call = self.calls[(namespace, key)] = {"done": Event(), "result": None, "error": None}
+            else:
+                stats["shared"] += 1
+        
+        if not leader:
+            call["done"].wait()
+            if call["error"]:
+                raise call["error"]
+            return call["result"]
+        
+        try:
+            result = check(*args) if check else None
+            if result is None:
+                stats["calls"] += 1
+                result = fn(*args)
+            else:
+                stats["cached"] += 1
+            call["result"] = result
+            return result
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[(namespace, key)]
+            call["done"].set()
+
+def estimate_size(value):
+    """估算缓存值占用的字节数(递归累加容器和元素大小)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+class DiskCache:
+    """SQLite磁盘缓存层: 每条记录保存自己的过期时间，写入先进内存队列，由后台线程批量落盘
+    
+    写入只走self.conn并由self.lock保护；查询使用每个线程自己的只读连接，
+    WAL模式下不会被落盘线程的写入、提交阻塞。
+    """
+    def __init__(self, path, flush_interval=1.0, max_pending=10000, purge_interval=3600):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        self.conn.commit()
+        self.lock = Lock()              # 保护写连接
+        self.readers = local()          # 每个线程的只读连接
+        self.reader_conns = []
+        self.pending = {}               # (命名空间, key) -> (值, 写入时间, 过期时间)，等待落盘
+        self.flushing = {}              # 正在写入数据库的批次，提交前仍从这里读取
+        self.pending_lock = Lock()
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.purge_interval = purge_interval
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "dropped": 0}
+        Thread(target=self.writer_loop, name="disk-cache-writer", daemon=True).start()
+
+    def get(self, namespace, key):
+        """返回 (值, 写入时间)，不存在或已过期时返回None"""
+        now = time.time()
+        with self.pending_lock:
+            record = self.pending.get((namespace, key)) or self.flushing.get((namespace, key))
+        if record:
+            value, stored_at, expires_at = record
+        else:
+            row = self.reader().execute(
+                "SELECT value, stored_at, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, str(key))
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, stored_at, expires_at = json.loads(row[0]), row[1], row[2]
+        
+        if expires_at <= now:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return value, stored_at
+
+    def reader(self):
+        """返回当前线程的只读连接，首次调用时创建"""
+        conn = getattr(self.readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self.readers.conn = conn
+            with self.pending_lock:
+                self.reader_conns.append(conn)
+        return conn
+
+    def put(self, namespace, key, value, stored_at, ttl):
+        """把记录放入落盘队列，不等待磁盘写入; 队列已满时丢弃"""
+        with self.pending_lock:
+            if len(self.pending) >= self.max_pending and (namespace, key) not in self.pending:
+                self.stats["dropped"] += 1
+                return
+            self.pending[(namespace, key)] = (value, stored_at, stored_at + ttl)
+
+    def flush(self):
+        """把落盘队列中的记录写入数据库"""
+        with self.lock:
+            with self.pending_lock:
+                batch = self.flushing = self.pending
+                self.pending = {}
+            if not batch:
+                return 0
+            
+            rows = [
+                (namespace, str(key), json.dumps(value, default=str), stored_at, expires_at)
+                for (namespace, key), (value, stored_at, expires_at) in batch.items()
+            ]
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows)
+                self.conn.commit()
+            finally:
+                with self.pending_lock:
+                    self.flushing = {}
+        self.stats["writes"] += len(rows)
+        return len(rows)
+
+    def load(self, namespace, limit):
+        """返回命名空间中最新的未过期记录 [(key, 值, 写入时间)]，按写入时间从旧到新"""
+        rows = self.reader().execute(
+            "SELECT key, value, stored_at FROM cache WHERE namespace = ? AND expires_at > ? "
+            "ORDER BY stored_at DESC LIMIT ?",
+            (namespace, time.time(), limit)
+        ).fetchall()
+        return [(key, json.loads(value), stored_at) for key, value, stored_at in reversed(rows)]
+
+    def purge_expired(self):
+        """删除已过期的记录，返回删除数量"""
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self.conn.commit()
+        return cursor.rowcount
+
+    def writer_loop(self):
+        last_purge = time.time()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.time() - last_purge >= self.purge_interval:
+                    removed = self.purge_expired()
+                    last_purge = time.time()
+                    if removed:
+                        logging.info(f"磁盘缓存清理过期记录: {removed}")
+            except Exception as e:
+                logging.error(f"磁盘缓存写入失败: {str(e)}")
+
+    def close(self):
+        self.flush()
+        with self.pending_lock:
+            readers, self.reader_conns = self.reader_conns, []
+        for conn in readers:
+            conn.close()
+        with self.lock:
+            self.conn.close()
+
+class TTLCache:
+    """有界缓存: 按命名空间设置TTL、最大条目数和字节预算，超出时按LRU淘汰，线程安全
+    
+    namespaces: {命名空间: {"ttl": 秒, "max_entries": 条目数, "max_bytes": 字节数, "stale_grace": 秒(可选)}}
+    disk: 可选的DiskCache，内存未命中时查询，写入时异步落盘
+    
+    超过TTL但仍在stale_grace宽限期内的条目会保留，lookup可以取到并标记为过期值。
+    """
+    def __init__(self, namespaces, clock=time.time, disk=None):
+        self.clock = clock
+        self.disk = disk
+        self.lock = Lock()
+        self.limits = {name: dict(limits) for name, limits in namespaces.items()}
+        self.entries = {name: OrderedDict() for name in namespaces}  # key -> (值, 写入时间, 字节数)
+        self.bytes = {name: 0 for name in namespaces}
+        self.stats = {name: {"hits": 0, "disk_hits": 0, "stale": 0, "misses": 0, "expired": 0, "evictions": 0}
+                      for name in namespaces}
+
+    def max_age(self, namespace):
+        """条目最长保留时间: TTL + 宽限期"""
+        limits = self.limits[namespace]
+        return limits["ttl"] + limits.get("stale_grace", 0)
+
+    def get(self, namespace, key):
+        """返回未过期的缓存值，不存在或已过期时返回None"""
+        result = self.lookup(namespace, key, allow_stale=False)
+        return result[0] if result else None
+
+    def lookup(self, namespace, key, allow_stale=True):
+        """返回 (值, 是否已过TTL)，不存在或超出宽限期时返回None"""
+        ttl = self.limits[namespace]["ttl"]
+        with self.lock:
+            entries = self.entries[namespace]
+            entry = entries.get(key)
+            if entry is not None:
+                age = self.clock() - entry[1]
+                if age < ttl:
+                    entries.move_to_end(key)
+                    self.stats[namespace]["hits"] += 1
+                    return entry[0], False
+                if age >= self.max_age(namespace):
+                    self._remove(namespace, key)
+                    self.stats[namespace]["expired"] += 1
+                elif allow_stale:
+                    entries.move_to_end(key)
+                    self.stats[namespace]["stale"] += 1
+                    return entry[0], True
+                else:
+                    self.stats[namespace]["misses"] += 1
+                    return None
+        
+        # 内存未命中时查询磁盘层，命中后放回内存
+        record = self.disk.get(namespace, key) if self.disk else None
+        if record is not None:
+            age = self.clock() - record[1]
+            if age < ttl or (allow_stale and age < self.max_age(namespace)):
+                self.set(namespace, key, record[0], stored_at=record[1], persist=False)
+                with self.lock:
+                    self.stats[namespace]["disk_hits" if age < ttl else "stale"] += 1
+                return record[0], age >= ttl
+        
+        with self.lock:
+            self.stats[namespace]["misses"] += 1
+        return None
+
+    def set(self, namespace, key, value, stored_at=None, persist=True):
+        """写入缓存，超出条目数或字节预算时淘汰最久未使用的条目
+        
+        stored_at为原始写入时间(从磁盘加载时保留剩余TTL); persist为True时同时异步写入磁盘层
+        """
+        stored_at = self.clock() if stored_at is None else stored_at
+        limits = self.limits[namespace]
+        if self.disk and persist:
+            self.disk.put(namespace, key, value, stored_at, self.max_age(namespace))
+        
+        size = estimate_size(key) + estimate_size(value)
+        with self.lock:
+            entries = self.entries[namespace]
+            if key in entries:
+                self._remove(namespace, key)
+            if size > limits["max_bytes"]:
+                return
+            entries[key] = (value, stored_at, size)
+            self.bytes[namespace] += size
+            while len(entries) > limits["max_entries"] or self.bytes[namespace] > limits["max_bytes"]:
+                self._remove(namespace, next(iter(entries)))
+                self.stats[namespace]["evictions"] += 1
+
+    def delete(self, namespace, key):
+        with self.lock:
+            if key in self.entries[namespace]:
+                self._remove(namespace, key)
+
+    def _remove(self, namespace, key):
+        _, _, size = self.entries[namespace].pop(key)
+        self.bytes[namespace] -= size
+
+    def purge_expired(self):
+        """清理所有已过期的条目，返回清理数量"""
+        removed = 0
+        now = self.clock()
+        with self.lock:
+            for namespace, entries in self.entries.items():
+                max_age = self.max_age(namespace)
+                for key in [k for k, entry in entries.items() if now - entry[1] >= max_age]:
+                    self._remove(namespace, key)
+                    self.stats[namespace]["expired"] += 1
+                    removed += 1
+        return removed
+
+    def warm(self):
+        """启动时从磁盘层加载各命名空间最新的未过期记录，返回加载数量"""
+        if not self.disk:
+            return 0
+        loaded = 0
+        for namespace, limits in self.limits.items():
+            for key, value, stored_at in self.disk.load(namespace, limits["max_entries"]):
+                self.set(namespace, key, value, stored_at=stored_at, persist=False)
+                loaded += 1
+        return loaded
+
+    def usage(self):
+        """返回各命名空间的 {entries: 条目数, bytes: 字节数}"""
+        with self.lock:
+            return {name: {"entries": len(entries), "bytes": self.bytes[name]} for name, entries in self.entries.items()}
+
+class MicroBatcher:
+    """微批处理: 在短时间窗口内收集查询，合并为一次批量请求后把结果分发给等待的调用者
+    
+    等待窗口随负载自适应: 按最近批次大小的滑动平均在 0~max_wait 之间调整，
+    空闲时单个查询立即发出，突发时窗口放大以凑满批次。
+    批次交给最多workers个线程执行，慢请求不会阻塞后续批次的收集和发送；
+    线程都在忙时分发线程等待空闲线程，期间到达的查询并入下一批。
+    """
+    def __init__(self, fetch, max_batch=20, max_wait=0.02, workers=4, name="batch"):
+        self.fetch = fetch          # fetch(key列表) -> {key: 结果}，缺失的key结果为None
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.slots = Semaphore(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.cond = Condition()
+        self.pending = {}           # key -> {"done", "result"}，同一key只查询一次
+        self.first_arrival = None
+        self.avg_batch = 1.0
+        self.stats = {"requests": 0, "batches": 0, "keys": 0}
+        Thread(target=self.dispatch_loop, name=name, daemon=True).start()
+
+    def window(self):
+        """当前的等待窗口(秒)"""
+        if self.max_batch <= 1:
+            return 0
+        load = min(1.0, (self.avg_batch - 1) / (self.max_batch - 1))
+        return self.max_wait * load
+
+    def get(self, key, timeout=None):
+        """提交查询并等待所在批次返回，超时返回None"""
+        with self.cond:
+            self.stats["requests"] += 1
+            call = self.pending.get(key)
+            if call is None:
+                call = self.pending[key] = {"done": Event(), "result": None}
+                if self.first_arrival is None:
+                    self.first_arrival = time.monotonic()
+                self.cond.notify()
+        call["done"].wait(timeout)
+        return call["result"]
+
+    def dispatch_loop(self):
+        while True:
+            self.slots.acquire()
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                # 等到批次凑满或窗口到期
+                while len(self.pending) < self.max_batch:
+                    remaining = self.first_arrival + self.window() - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                
+                keys = list(itertools.islice(self.pending, self.max_batch))
+                calls = {key: self.pending.pop(key) for key in keys}
+                self.first_arrival = time.monotonic() if self.pending else None
+                self.avg_batch = self.avg_batch * 0.8 + len(keys) * 0.2
+                self.stats["batches"] += 1
+                self.stats["keys"] += len(keys)
+            
+            self.executor.submit(self.run_batch, keys, calls)
+
+    def run_batch(self, keys, calls):
+        """执行一个批次并唤醒等待的调用者"""
+        results = {}
+        try:
+            results = self.fetch(keys) or {}
+        except Exception as e:
+            logging.error(f"批量请求失败: {str(e)}")
+        finally:
+            self.slots.release()
+        for key, call in calls.items():
+            call["result"] = results.get(key)
+            call["done"].set()
+
+class TokenBucket:
+    """令牌桶限速器: 线程安全，线程和asyncio调用方均可等待，时钟可替换用于模拟
+    
+    采用预占方式: 令牌不足时余额为负，后来的调用方按顺序排在后面等待。
+    """
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _wait(self, now):
+        return max(0, self.updated - now) + max(0, -self.tokens) / self.rate
+
+    def reserve(self, tokens=1):
+        """预占令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= tokens
+            return self._wait(now)
+
+    def try_acquire(self, tokens=1):
+        """令牌充足时立即取走并返回True，否则不等待直接返回False"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            if self.updated > now or self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            return True
+
+    def wait_time(self, tokens=1):
+        """返回取得令牌还需等待的秒数(不预占)"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            return max(0, self.updated - now) + max(0, tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """阻塞等待令牌，只阻塞当前调用方"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """在事件循环中等待令牌，不阻塞其他协程"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, seconds):
+        """节点返回429时暂停发放令牌seconds秒，由后续调用方各自等待"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0)
+            self.updated = max(self.updated, now + seconds)
+
+    def update(self, rate):
+        """调整令牌补充速率，容量按同样比例缩放"""
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            self.capacity = max(1, self.capacity * rate / self.rate)
+            self.tokens = min(self.tokens, self.capacity)
+            self.rate = float(rate)
+
+class AdaptiveConcurrency:
+    """AIMD自适应并发: 延迟和错误率正常时在途上限加性增长，429或超时时乘性减半"""
+    def __init__(self, limit=4, min_limit=1, max_limit=64, backoff=0.5, max_error_rate=0.05):
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.max_error_rate = max_error_rate
+        self.error_rate = 0.0
+        self.inflight = 0
+        self.last_decrease = 0
+        self.cond = Condition()
+
+    def try_acquire(self):
+        with self.cond:
+            if self.inflight < int(self.limit):
+                self.inflight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """等待在途请求数低于当前上限"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+
+    async def acquire_async(self):
+        while not self.try_acquire():
+            await asyncio.sleep(0.01)
+
+    def release(self, latency=None, latency_budget=None, throttled=False, failed=False):
+        """请求结束后按结果调整上限，返回 (调整前上限, 调整后上限)"""
+        with self.cond:
+            self.inflight -= 1
+            old_limit = self.limit
+            self.error_rate = self.error_rate * 0.9 + (0.1 if throttled or failed else 0)
+            
+            if throttled:
+                # 同一批在途请求的连续429/超时只减半一次
+                now = time.monotonic()
+                if now - self.last_decrease > 1:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.last_decrease = now
+            elif (not failed and self.error_rate < self.max_error_rate
+                  and (latency_budget is None or latency <= latency_budget)
+                  and self.inflight + 1 >= int(self.limit)):
+                # 上限已用满且延迟正常时才增长，每轮在途请求约加1
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            
+            self.cond.notify_all()
+            return old_limit, self.limit
+
+class SimulatedClock:
+    """模拟时钟: sleep只推进时间不真正等待，用于限速器基准测试"""
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0, seconds)
+
+def benchmark_rate_limiter(rate=10, burst=10, workers=20, duration=60, service_time=0.05, throttle_at=None, penalty=5):
+    """在模拟时钟上让workers个调用方争用同一个令牌桶，比较实际吞吐与配置预算
+    
+    throttle_at为模拟节点返回429的时间点(秒)，此时令牌桶暂停penalty秒
+    """
+    clock = SimulatedClock()
+    bucket = TokenBucket(rate, burst, clock=clock.time, sleep=clock.sleep)
+    # 各调用方下一次发起请求的时间
+    ready = [(0.0, worker) for worker in range(workers)]
+    granted = 0
+    waits = []
+    throttled = False
+    
+    while ready:
+        ready.sort()
+        start, worker = ready.pop(0)
+        clock.now = start
+        if throttle_at is not None and not throttled and start >= throttle_at:
+            bucket.penalize(penalty)
+            throttled = True
+        
+        wait = bucket.reserve()
+        if start + wait > duration:
+            continue
+        granted += 1
+        waits.append(wait)
+        ready.append((start + wait + service_time, worker))
+    
+    budget = rate * (duration - (penalty if throttle_at is not None else 0)) + burst
+    waits.sort()
+    result = {
+        "granted": granted,
+        "budget": budget,
+        "throughput": granted / duration,
+        "utilization": granted / budget if budget else 0,
+        "p95_wait": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0
+    }
+    print(f"令牌桶 {rate}/s (容量 {burst}), {workers}个调用方, 模拟 {duration}s: "
+          f"放行 {granted} / 预算 {budget:.0f} ({result['utilization']:.1%}), "
+          f"吞吐 {result['throughput']:.2f}/s, 等待p95 {result['p95_wait'] * 1000:.0f}ms")
+    return result
+
+class SlotClock:
+    """slot节奏模型: 根据观测到的slot变化时间估计出块间隔，预测下一个slot的到达时间
+    
+    slot变化时刻取"最后一次看到旧slot"和"首次看到新slot"的中点，
+    轮询在预计时刻之前略早开始，使估计的出块相位不会逐渐滞后。
+    """
+    def __init__(self, slot_time=0.4):
+        self.slot_time = slot_time
+        self.last_slot = None
+        self.last_change = None
+        self.last_stale = None
+        self.lock = Lock()
+
+    def calibrate(self, samples):
+        """用getRecentPerformanceSamples的结果校准出块间隔"""
+        slots = sum(sample.get("numSlots", 0) for sample in samples)
+        seconds = sum(sample.get("samplePeriodSecs", 0) for sample in samples)
+        if slots and seconds:
+            with self.lock:
+                self.slot_time = seconds / slots
+        return self.slot_time
+
+    def observe(self, slot, now=None):
+        """记录观测到的slot，slot前进时更新出块间隔的EWMA"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.last_slot is not None and slot <= self.last_slot:
+                self.last_stale = now
+                return False
+            
+            changed_at = now
+            if self.last_stale is not None and self.last_change is not None and self.last_stale > self.last_change:
+                changed_at = (self.last_stale + now) / 2
+            if self.last_slot is not None:
+                per_slot = (changed_at - self.last_change) / (slot - self.last_slot)
+                if 0 < per_slot < 5 * self.slot_time:
+                    self.slot_time = self.slot_time * 0.9 + per_slot * 0.1
+            self.last_slot = slot
+            self.last_change = changed_at
+            return True
+
+    def delay_until_next(self, now=None):
+        """距离开始轮询下一个slot还需等待的秒数(比预计时刻提前八分之一个slot)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.last_change is None:
+                return 0
+            return max(0, self.last_change + self.slot_time * 7 / 8 - now)
+
 def format_number(number):
     """将数字格式化为K/M/B格式"""
     if number >= 1_000_000_000:
@@ -35,8 +1909,6 @@ class TokenMonitor:
             self.config = self.load_config()
             self.api_keys = self.config.get('api_keys', [])
             self.current_key = 0
-            self.request_counts = {}
-            self.last_reset = {}
             self.wcf = None
             self.watch_addresses = self.load_watch_addresses()
             self.init_wcf()
@@ -53,51 +1925,177 @@ class TokenMonitor:
             if 'proxy' in self.config:
                 self.proxy_config.update(self.config['proxy'])
             
-            # 初始化API密钥计数器
-            for key in self.api_keys:
-                if key.strip():
-                    self.request_counts[key] = 0
-                    self.last_reset[key] = time.time()
+            # Birdeye查询配置
+            self.birdeye_config = {
+                'batch_window_ms': 20,   # 代币信息批量查询的最大等待窗口(毫秒)
+                'batch_max_size': 20,    # 单次multi_tokens请求的最多地址数
+                'batch_workers': 4,      # 同时在途的multi_tokens请求数
+                'batch_timeout': 30      # 调用方等待批次结果的秒数，需大于请求最坏耗时(代理超时10秒+直连重试10秒)
+            }
+            if 'birdeye' in self.config:
+                self.birdeye_config.update(self.config['birdeye'])
+            
+            # 每个API密钥一个令牌桶(每分钟100次)
+            self.key_limiters = {
+                key: TokenBucket(100 / 60, 100)
+                for key in self.api_keys if key.strip()
+            }
 
-            # 添加缓存
-            self.cache = {
-                'token_info': {},
-                'creator_history': {},
-                'fund_flow': {}
+            # 区块采集配置
+            self.ingest_config = {
+                'mode': 'thread',         # thread: 线程池轮询, async: 单事件循环采集, signatures: 按程序签名采集, logs: WebSocket流式采集
+                'max_inflight': 32,       # async模式同时在途的getBlock请求数
+                'pool_size': 8,           # async模式每个节点的持久连接数
+                'request_timeout': 5,     # async模式单个请求超时(秒)
+                'poll_interval': 0.1,     # signatures模式轮询间隔(秒)
+                'signature_limit': 1000,  # signatures模式每页签名数
+                'max_signature_backlog': 5000,  # signatures模式单次最多补采的签名数
+                'ws_url': None,           # logs模式WebSocket地址(为空时由RPC地址推导)
+                'ws_idle_timeout': 30,    # logs模式无消息超过该秒数视为订阅断开
+                'record_path': None,      # logs模式录制通知的JSONL文件(供本地替身回放)
+                'checkpoint_file': '~/.solana_pump/checkpoint.json',  # 已处理slot检查点
+                'checkpoint_interval': 5, # 检查点写入间隔(秒)
+                'catchup_max_slots': 9000, # 重启后最多补采的slot数(约1小时)，更早的缺口直接跳过
+                'max_missing_slots': 50000, # 最多跟踪的丢失slot数，超出时丢弃最旧的缺口
+                'retry_max_attempts': 8,  # 单个slot最多重试次数
+                'retry_base_delay': 1,    # 重试退避基数(秒)，每次失败翻倍
+                'retry_max_delay': 300,   # 重试退避上限(秒)
+                'hedge_max': 2,           # 单个请求最多额外发送的对冲请求数
+                'hedge_default_delay': 0.3, # 节点延迟样本不足时的对冲等待时间(秒)
+                'shard_slots': 'catchup', # 按节点容量分片下载区块: catchup(仅补采和重试)/all/off
+                'decode_processes': 0,    # 区块解码进程数，0(默认)为在处理线程中解码; 大于0时启用解码进程池，建议不超过CPU核数-1
+                'decode_ring_mb': 64      # 启用解码进程池时，向解码进程传递区块的共享内存环形缓冲区大小(MB)，0为通过管道pickle传递
             }
-            self.cache_expire = {
-                'token_info': 300,      # 5分钟
-                'creator_history': 1800, # 30分钟
-                'fund_flow': 600        # 10分钟
+            # 从配置文件加载采集设置
+            if 'ingest' in self.config:
+                self.ingest_config.update(self.config['ingest'])
+            
+            # slot检查点与补采控制
+            self.checkpoint = SlotCheckpoint(self.ingest_config['checkpoint_file'])
+            self.live_idle = Event()   # 实时采集空闲时才允许补采下载
+            self.live_idle.set()
+            
+            # slot节奏模型，以及slotSubscribe推送的最新slot
+            self.slot_clock = SlotClock()
+            self.streamed_slot = 0
+            self.slot_stream_updated = 0
+            self.slot_cond = Condition()
+
+            # v0交易的地址查找表缓存
+            self.alt_cache = AddressLookupTableCache(self.fetch_lookup_table)
+            
+            # 区块解码器(orjson/msgspec/json)
+            self.json_decoder = JsonDecoder(self.config.get('json_decoder'))
+            logging.info(f"区块JSON解码器: {self.json_decoder.name}")
+            self.decode_pool = None  # 区块解码进程池，在start_worker_threads中创建
+            self.decode_ring = None  # 向解码进程传递区块的共享内存环形缓冲区
+            
+            # 添加缓存
+            self.cache_config = {
+                'token_meta': {'ttl': 3600, 'max_entries': 20000, 'max_bytes': 32 * 1024 * 1024,      # 名称/符号/供应量，1小时
+                               'stale_grace': 86400},  # 过期1天内先返回旧值，后台刷新
+                'token_info': {'ttl': 60, 'max_entries': 20000, 'max_bytes': 32 * 1024 * 1024},       # 价格/市值/持有人，1分钟
+                'creator_history': {'ttl': 1800, 'max_entries': 5000, 'max_bytes': 64 * 1024 * 1024}, # 30分钟
+                'fund_flow': {'ttl': 600, 'max_entries': 5000, 'max_bytes': 32 * 1024 * 1024},        # 10分钟
+                'price_history': {'ttl': 1800, 'max_entries': 20000, 'max_bytes': 16 * 1024 * 1024},  # 历史最高价，30分钟
+                'success_tokens': {'ttl': 3600, 'max_entries': 20000, 'max_bytes': 32 * 1024 * 1024}  # 1小时
             }
+            # 从配置文件加载各命名空间的缓存限制
+            for namespace, limits in self.config.get('cache', {}).items():
+                self.cache_config.setdefault(namespace, {'ttl': 300, 'max_entries': 5000, 'max_bytes': 32 * 1024 * 1024}).update(limits)
+            # 内存缓存之后是SQLite磁盘层，重启后不必重新查询Birdeye
+            self.cache_db_file = os.path.expanduser("~/.solana_pump/enrich_cache.db")
+            try:
+                disk_cache = DiskCache(self.cache_db_file)
+            except (sqlite3.Error, OSError) as e:
+                logging.error(f"打开磁盘缓存失败，只使用内存缓存: {str(e)}")
+                disk_cache = None
+            self.cache = TTLCache(self.cache_config, disk=disk_cache)
+            logging.info(f"从磁盘缓存预热 {self.cache.warm()} 条记录")
             
             # 增加并行处理配置
-            self.parallel_requests = 20  # 增加到20个并行请求
+            self.parallel_requests = 20  # 批量下载区块的并行请求数
             self.block_batch_size = 100  # 每批处理100个区块
             self.worker_threads = 20     # 增加工作线程
             
             # 创建处理队列(增加队列大小)
-            self.tx_queue = Queue(maxsize=1000)
+            # 区块队列按 (优先级, slot, 序号, 数据) 排序，实时区块优先于补采区块
+            self.tx_queue = PriorityQueue(maxsize=1000)
+            self.tx_seq = itertools.count()
             self.result_queue = Queue(maxsize=1000)
+            # 分析完成待推送的警报，与result_queue各由一组线程消费
+            self.alert_queue = Queue(maxsize=1000)
+            # 最近输出过的新币，流式推送和断线补齐可能包含同一笔create交易
+            self.emitted_mints = OrderedDict()
+            self.emitted_lock = Lock()
             
             # 创建线程池
             self.executor = ThreadPoolExecutor(max_workers=self.worker_threads)
             
+            # 按主机复用的HTTP长连接池，连接数与最大并发一致
+            self.http = HttpClientPool(pool_size=max(self.parallel_requests, self.worker_threads))
+            
+            # 合并相同代币/创建者的并发查询
+            self.inflight = SingleFlight()
+            
+            # 过期缓存的后台刷新线程池
+            self.refresh_executor = ThreadPoolExecutor(max_workers=4)
+            
+            # 代币信息微批处理: 多个代币合并为一次multi_tokens请求
+            self.token_batcher = MicroBatcher(
+                self.request_token_infos,
+                max_batch=self.birdeye_config['batch_max_size'],
+                max_wait=self.birdeye_config['batch_window_ms'] / 1000,
+                workers=self.birdeye_config['batch_workers'],
+                name="token-batcher"
+            )
+            
             # 添加监控指标
             self.metrics = {
                 'processed_blocks': 0,
                 'processed_txs': 0,
-                'missed_blocks': set(),
+                'decoded_bytes': 0,      # 预过滤后实际解码的字节数
+                'pool_decoded_blocks': 0, # 由解码进程池处理的区块数
+                'pool_fallbacks': 0,     # 需要查找表、回到主进程重新解码的区块数
+                'skipped_bytes': 0,      # 预过滤跳过解码的字节数
                 'last_process_time': time.time(),
-                'processing_delays': []
+                'processing_delays': [],
+                'slot_polls': 0,         # getSlot轮询次数
+                'hedge_requests': 0,     # 经过对冲策略的请求数
+                'hedge_sent': 0,         # 额外发出的对冲请求数
+                'hedge_wins': 0,         # 对冲请求先于首选节点返回的次数
+                'hedge_wasted': 0,       # 成功返回但结果未被使用的请求数(失败或超时的不计)
+                'token_revalidations': 0 # 返回过期代币信息后发起的后台刷新次数
             }
             
-            # 启动监控线程
-            Thread(target=self.monitor_metrics, daemon=True).start()
+            # 节点延迟统计(对冲请求阈值)及对冲请求线程池
+            self.latency_stats = LatencyStats()
+            self.hedge_executor = ThreadPoolExecutor(max_workers=self.ingest_config['hedge_max'] * 8 + 8)
+            
+            # 丢失区块跟踪(区间存储 + 指数退避)
+            self.gap_tracker = SlotGapTracker(
+                max_slots=self.ingest_config['max_missing_slots'],
+                max_attempts=self.ingest_config['retry_max_attempts'],
+                base_delay=self.ingest_config['retry_base_delay'],
+                max_delay=self.ingest_config['retry_max_delay']
+            )
+            # 恢复上次运行时尚未补回的缺口
+            if self.checkpoint.saved_gaps:
+                self.gap_tracker.restore(self.checkpoint.saved_gaps)
+                logging.info(f"从检查点恢复 {len(self.gap_tracker)} 个待重试的slot")
             
             # 初始化RPC节点管理
             self.init_rpc_nodes()
             
+            # 启动监控线程
+            Thread(target=self.monitor_metrics, daemon=True).start()
+            
+            # 启动丢失区块重试线程
+            Thread(target=self.retry_missed_blocks, daemon=True).start()
+            
+            # 启动节点健康探测线程
+            Thread(target=self.probe_nodes, daemon=True).start()
+            
             # 初始化代理IP池
             self.proxy_pool = []
             self.current_proxy = 0
@@ -132,25 +2130,42 @@ class TokenMonitor:
             "https://api.mainnet.rpcpool.com": {"weight": 2, "fails": 0, "last_used": 0},
         }
         
+        # 加入节点测试和scan.py扫描发现的节点
+        self.load_extra_rpc_nodes()
+        
         # 优化请求限制
         self.request_limits = {
             "default": {
-                "requests_per_second": 10,  # 增加每秒请求数
-                "min_interval": 0.1,     # 减少最小间隔
+                "requests_per_second": 10,  # 令牌桶每秒补充的令牌数
+                "burst": 10,             # 令牌桶容量(允许的突发请求数)
+                "concurrency": 4,        # 初始在途请求上限(AIMD自适应调整)
+                "max_concurrency": 64,   # 在途请求上限的最大值
                 "burst_wait": 5,         # 减少等待时间
-                "current_requests": 0,
-                "last_request": 0
+                "max_batch": 20,         # JSON-RPC批量请求的最大条数(节点拒绝时自动缩小)
             }
         }
         
-        # 为每个节点初始化请求计数器
+        # 为每个节点初始化请求限制，令牌桶在首次请求时创建
         for node in self.rpc_nodes:
             self.request_limits[node] = self.request_limits["default"].copy()
+        self.rate_limiters = {}
+        self.rate_limiters_lock = Lock()
+        
+        # 加载上次运行学习到的节点并发和速率
+        self.node_limits_file = os.path.expanduser("~/.solana_pump/node_limits.json")
+        self.concurrency_limiters = {}
+        self.load_node_limits()
         
         self.current_rpc = None
-        self.rpc_switch_interval = 60  # 60秒切换一次节点
-        self.last_rpc_switch = 0
         self.max_fails = 3  # 最大失败次数
+        
+        # 后台健康探测: 每个节点的EWMA延迟、错误率和slot落后数，以及排好序的节点快照
+        self.node_health = {}
+        self.ranked_nodes = ()
+        self.health_lock = Lock()
+        self.probe_interval = 2       # 探测间隔(秒)
+        self.max_slot_lag = 30        # 落后集群最高slot超过该值的节点排到最后
+        self.probe_executor = ThreadPoolExecutor(max_workers=16)
 
     def load_config(self):
         try:
@@ -188,44 +2203,116 @@ class TokenMonitor:
     def get_next_api_key(self):
         """获取下一个可用的API密钥"""
         try:
-            now = time.time()
-            for key in self.api_keys:
-                if not key.strip():
-                    continue
-                    
-                if now - self.last_reset[key] >= 60:
-                    self.request_counts[key] = 0
-                    self.last_reset[key] = now
-                
-                if self.request_counts[key] < 100:
-                    self.request_counts[key] += 1
+            if not self.key_limiters:
+                raise Exception("没有可用的API密钥")
+            
+            for key, limiter in self.key_limiters.items():
+                if limiter.try_acquire():
                     return key
             
-            raise Exception("所有API密钥已达到限制")
+            # 所有密钥都已用完本分钟额度，等待最早恢复的密钥
+            key = min(self.key_limiters, key=lambda k: self.key_limiters[k].wait_time())
+            self.key_limiters[key].acquire()
+            return key
         except Exception as e:
             logging.error(f"获取API密钥失败: {str(e)}")
             logging.error(f"详细错误: {traceback.format_exc()}")
             raise
 
-    def check_rate_limit(self, node):
-        """检查是否超出请求限制"""
-        current_time = time.time()
-        limits = self.request_limits.get(node, self.request_limits["default"])
+    def load_extra_rpc_nodes(self):
+        """从monitor.sh的节点测试结果和scan.py的扫描结果加载额外RPC节点"""
+        sources = [
+            self.rpc_file,                                            # 最佳节点
+            os.path.expanduser("~/.solana_pump/rpc_list.txt"),        # 节点测试结果: 地址|延迟|状态
+            os.path.expanduser("~/.solana_pump/scan_nodes.txt")       # scan.py发现的节点
+        ]
+        added = 0
+        for path in sources:
+            try:
+                with open(path) as f:
+                    for line in f:
+                        node = line.split("|")[0].strip()
+                        if node.startswith("http") and node not in self.rpc_nodes:
+                            self.rpc_nodes[node] = {"weight": 1, "fails": 0, "last_used": 0}
+                            added += 1
+            except OSError:
+                continue
         
-        # 检查最小间隔
-        if current_time - limits["last_request"] < limits["min_interval"]:
-            time.sleep(limits["min_interval"])
+        if added:
+            logging.info(f"加载了 {added} 个额外RPC节点")
+
+    def load_node_limits(self):
+        """从文件恢复各节点学习到的在途上限和请求速率"""
+        try:
+            with open(self.node_limits_file) as f:
+                learned = json.load(f)
+        except (OSError, ValueError):
+            return
         
-        # 检查每秒请求数
-        if limits["current_requests"] >= limits["requests_per_second"]:
-            sleep_time = 1.0 - (current_time - limits["last_request"])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-            limits["current_requests"] = 0
+        for node, values in learned.items():
+            limits = self.request_limits.setdefault(node, self.request_limits["default"].copy())
+            limits["concurrency"] = values.get("concurrency", limits["concurrency"])
+            limits["requests_per_second"] = values.get("requests_per_second", limits["requests_per_second"])
+        logging.info(f"已加载 {len(learned)} 个节点的自适应限速配置")
+
+    def save_node_limits(self):
+        """原子保存各节点当前的在途上限和请求速率"""
+        learned = {}
+        for node, controller in list(self.concurrency_limiters.items()):
+            learned[node] = {
+                "concurrency": round(controller.limit, 2),
+                "requests_per_second": round(self.get_rate_limiter(node).rate, 2)
+            }
+        if not learned:
+            return
         
-        limits["current_requests"] += 1
-        limits["last_request"] = current_time
-        return True
+        try:
+            os.makedirs(os.path.dirname(self.node_limits_file), exist_ok=True)
+            tmp_path = self.node_limits_file + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(learned, f, indent=2)
+            os.replace(tmp_path, self.node_limits_file)
+        except Exception as e:
+            logging.error(f"保存节点限速配置失败: {str(e)}")
+
+    def get_concurrency_limiter(self, node):
+        """返回节点的自适应并发控制器，首次使用时按request_limits创建"""
+        controller = self.concurrency_limiters.get(node)
+        if controller is None:
+            with self.rate_limiters_lock:
+                controller = self.concurrency_limiters.get(node)
+                if controller is None:
+                    limits = self.request_limits.get(node, self.request_limits["default"])
+                    controller = AdaptiveConcurrency(limits["concurrency"], max_limit=limits["max_concurrency"])
+                    self.concurrency_limiters[node] = controller
+        return controller
+
+    def node_request_done(self, node, latency=None, latency_budget=None, throttled=False, failed=False):
+        """请求结束时更新节点并发上限，令牌桶速率随上限同比例调整
+        
+        只有实际采集请求成功才清零节点失败次数，getSlot探测成功不算。
+        """
+        old_limit, new_limit = self.get_concurrency_limiter(node).release(latency, latency_budget, throttled, failed)
+        if latency is not None and not (throttled or failed) and node in self.rpc_nodes:
+            self.rpc_nodes[node]["fails"] = 0
+            self.rpc_nodes[node]["last_used"] = time.time()
+        if new_limit != old_limit:
+            limiter = self.get_rate_limiter(node)
+            limiter.update(limiter.rate * new_limit / old_limit)
+            if throttled:
+                logging.info(f"节点 {node} 并发上限降为 {new_limit:.1f} ({limiter.rate:.1f} req/s)")
+
+    def get_rate_limiter(self, node):
+        """返回节点的令牌桶，首次使用时按request_limits创建"""
+        limiter = self.rate_limiters.get(node)
+        if limiter is None:
+            with self.rate_limiters_lock:
+                limiter = self.rate_limiters.get(node)
+                if limiter is None:
+                    limits = self.request_limits.get(node, self.request_limits["default"])
+                    limiter = TokenBucket(limits["requests_per_second"], limits["burst"])
+                    self.rate_limiters[node] = limiter
+        return limiter
 
     def get_next_proxy(self):
         """获取下一个代理配置（每次请求换一个IP）"""
@@ -240,42 +2327,78 @@ class TokenMonitor:
             "https": proxy_url
         }
 
+    def get_hedge_nodes(self, primary):
+        """返回可用于对冲请求的其他健康节点，按健康探测的排序"""
+        candidates = [
+            node for node in self.ranked_nodes
+            if node != primary and node in self.rpc_nodes and self.rpc_nodes[node]["fails"] < self.max_fails
+        ]
+        return candidates[:self.ingest_config['hedge_max']]
+
     def parallel_rpc_request(self, method, params=None):
-        """并行发送RPC请求到多个节点"""
-        futures = []
+        """对冲请求: 先发给最佳节点，超过该节点p95延迟仍未返回时再发给另一个健康节点"""
+        primary = self.get_best_rpc()
+        backups = self.get_hedge_nodes(primary)
+        futures = {}
         
-        with ThreadPoolExecutor(max_workers=self.parallel_requests) as executor:
-            # 同时发起多个请求
-            for _ in range(self.parallel_requests):
-                rpc = self.get_best_rpc()
-                proxy = self.get_next_proxy()  # 每个请求使用新的IP
-                
-                future = executor.submit(
-                    self.make_rpc_request,
-                    rpc,
-                    method,
-                    params,
-                    proxy
-                )
-                futures.append(future)
+        def send(node):
+            proxy = self.get_next_proxy()  # 每个请求使用新的IP
+            future = self.hedge_executor.submit(self.make_rpc_request, node, method, params, proxy)
+            futures[future] = node
+            return node
+        
+        self.metrics['hedge_requests'] += 1
+        current = send(primary)
+        
+        while futures:
+            # 等待当前节点的p95延迟，超时未返回则发出对冲请求
+            delay = None
+            if backups:
+                delay = self.latency_stats.percentile(current, 0.95, self.ingest_config['hedge_default_delay'])
+            done, _ = wait(list(futures), timeout=delay, return_when=FIRST_COMPLETED)
             
-            # 等待第一个成功的结果
-            for future in as_completed(futures):
+            for future in done:
+                node = futures.pop(future)
                 try:
                     result = future.result()
-                    if result and result.status_code == 200:
-                        return result
-                except Exception as e:
-                    continue
+                except Exception:
+                    result = None
+                
+                if result and result.status_code == 200:
+                    if node != primary:
+                        self.metrics['hedge_wins'] += 1
+                    # 仍在途的请求结果不再使用，之后成功返回的计为浪费
+                    for pending in futures:
+                        if not pending.cancel():
+                            pending.add_done_callback(self.count_wasted_hedge)
+                    return result
+            
+            # 超时或已返回的请求失败时，发给下一个节点
+            if backups and (not done or not futures):
+                current = send(backups.pop(0))
+                self.metrics['hedge_sent'] += 1
         
         return None
 
+    def count_wasted_hedge(self, future):
+        """对冲请求已有结果后，其余请求成功返回的计入hedge_wasted"""
+        try:
+            response = future.result()
+        except Exception:
+            return
+        if response is not None and response.status_code == 200:
+            self.metrics['hedge_wasted'] += 1
+
     def make_rpc_request(self, node, method, params=None, proxy=None):
         """发送RPC请求，支持指定代理"""
+        timeout = 3
+        self.get_concurrency_limiter(node).acquire()
+        outcome = {"failed": True}
         try:
-            self.check_rate_limit(node)
+            self.get_rate_limiter(node).acquire()
             
-            response = requests.post(
+            start_time = time.time()
+            response = self.http.post(
                 node,
                 json={
                     "jsonrpc": "2.0",
@@ -284,84 +2407,307 @@ class TokenMonitor:
                     "params": params or []
                 },
                 proxies=proxy,
-                timeout=3,
+                timeout=timeout,
                 verify=False
             )
+            latency = time.time() - start_time
+            outcome = {"latency": latency, "failed": response.status_code != 200}
+            
+            if response.status_code == 200:
+                self.latency_stats.record(node, latency)
             
             if response.status_code == 429:
                 logging.warning(f"节点 {node} 触发请求限制")
-                time.sleep(self.request_limits[node]["burst_wait"])
+                outcome["throttled"] = True
+                self.get_rate_limiter(node).penalize(self.request_limits.get(node, self.request_limits["default"])["burst_wait"])
                 return None
                 
             return response
             
+        except requests.exceptions.Timeout:
+            logging.warning(f"请求超时: {node}")
+            outcome["throttled"] = True
+            return None
         except Exception as e:
             logging.warning(f"请求失败: {str(e)}")
             return None
+        finally:
+            self.node_request_done(node, latency_budget=timeout / 2, **outcome)
+
+    def make_batch_rpc_request(self, node, method, params_list, proxy=None, raw=False):
+        """以JSON-RPC数组批量发送同一方法的请求，按id映射回请求序号，返回 {序号: 响应}
+        
+        raw=True时带结果的响应保留为原始字节(不解码)，错误响应仍为dict
+        """
+        results = {}
+        if not params_list:
+            return results
+        
+        limits = self.request_limits.get(node, self.request_limits["default"])
+        batch_size = max(1, min(len(params_list), limits["max_batch"]))
+        indexes = list(range(len(params_list)))
+        
+        for start in range(0, len(indexes), batch_size):
+            self._send_rpc_batch(node, method, params_list, indexes[start:start + batch_size], results, proxy, raw)
+        
+        return results
+
+    def _send_rpc_batch(self, node, method, params_list, indexes, results, proxy=None, raw=False):
+        """发送一个批次，节点拒绝或截断大批次时对半拆分重试"""
+        limits = self.request_limits.get(node, self.request_limits["default"])
+        items = None
+        should_split = False
+        timeout = 3 + 0.5 * len(indexes)
+        self.get_concurrency_limiter(node).acquire()
+        outcome = {"failed": True}
+        
+        try:
+            self.get_rate_limiter(node).acquire()
+            
+            start_time = time.time()
+            response = self.http.post(
+                node,
+                json=[
+                    {
+                        "jsonrpc": "2.0",
+                        "id": i,
+                        "method": method,
+                        "params": params_list[i] or []
+                    }
+                    for i in indexes
+                ],
+                proxies=proxy,
+                timeout=timeout,
+                verify=False
+            )
+            outcome = {"latency": time.time() - start_time, "failed": response.status_code != 200}
+            
+            if response.status_code == 429:
+                logging.warning(f"节点 {node} 触发请求限制")
+                outcome["throttled"] = True
+                self.get_rate_limiter(node).penalize(limits["burst_wait"])
+                return
+            
+            if response.status_code == 200:
+                items = split_batch_response(response.content) if raw else None
+                if items is None:
+                    items = self.json_decoder.loads(response.content)
+                    if isinstance(items, list):
+                        items = [(item.get("id"), item) for item in items if isinstance(item, dict)]
+            # 413/400等状态或非数组响应说明节点不接受这么大的批次
+            should_split = not isinstance(items, list)
+            
+        except requests.exceptions.Timeout:
+            logging.warning(f"批量请求超时: {node} ({len(indexes)}条)")
+            outcome["throttled"] = True
+            should_split = True
+        except ValueError:
+            # 响应被截断导致JSON解析失败
+            outcome["failed"] = True
+            should_split = True
+        except Exception as e:
+            logging.warning(f"批量请求失败: {str(e)}")
+            return
+        finally:
+            self.node_request_done(node, latency_budget=timeout / 2, **outcome)
+        
+        if isinstance(items, list):
+            for item_id, item in items:
+                if item_id in indexes:
+                    results[item_id] = item
+        
+        missing = [i for i in indexes if i not in results]
+        if not missing:
+            # 整批成功，逐步恢复批次大小
+            if len(indexes) >= limits["max_batch"]:
+                limits["max_batch"] = min(self.request_limits["default"]["max_batch"], limits["max_batch"] + 1)
+            return
+        
+        if not (should_split or len(missing) < len(indexes)):
+            return
+        
+        if len(indexes) == 1:
+            # 节点不支持数组请求时退回单条请求
+            response = self.make_rpc_request(node, method, params_list[indexes[0]], proxy)
+            if response and response.status_code == 200:
+                try:
+                    results[indexes[0]] = raw_or_decoded(response.content) if raw else response.json()
+                except ValueError:
+                    pass
+            return
+        
+        # 节点拒绝或截断了批次，缩小该节点的批次上限后重试缺失部分
+        limits["max_batch"] = max(1, len(indexes) // 2)
+        logging.info(f"节点 {node} 批次过大，批次上限调整为 {limits['max_batch']}")
+        
+        half = max(1, len(missing) // 2)
+        for part in (missing[:half], missing[half:]):
+            if part:
+                self._send_rpc_batch(node, method, params_list, part, results, proxy, raw)
+
+    def fetch_blocks(self, node, slots, proxy=None, commitment=None):
+        """批量获取区块，返回 {slot: 响应}; commitment为空时使用节点默认的finalized"""
+        options = {"encoding":"json","transactionDetails":"full","maxSupportedTransactionVersion":0}
+        if commitment:
+            options["commitment"] = commitment
+        responses = self.make_batch_rpc_request(
+            node,
+            "getBlock",
+            [[slot, options] for slot in slots],
+            proxy,
+            raw=True
+        )
+        return {slots[i]: item for i, item in responses.items()}
+
+    def fetch_lookup_table(self, table):
+        """获取地址查找表账户的原始数据"""
+        response = self.make_rpc_request(
+            self.get_best_rpc(),
+            "getAccountInfo",
+            [table, {"encoding": "base64", "commitment": "confirmed"}]
+        )
+        try:
+            value = response.json()["result"]["value"]
+            return base64.b64decode(value["data"][0]) if value else None
+        except Exception:
+            return None
+
+    def get_produced_slots(self, rpc, start_slot, end_slot, commitment=None):
+        """用getBlocks查询范围内实际出块的slot，返回 (出块slot列表, 已确认覆盖到的slot)
+        
+        被跳过的slot不会出现在结果中；最后一个出块slot之后的部分节点可能尚未确认，
+        留到下一轮再查。查询失败时退回整个范围逐个getBlock。
+        """
+        if end_slot < start_slot:
+            return [], end_slot
+        
+        produced = []
+        for chunk_start in range(start_slot, end_slot + 1, GET_BLOCKS_MAX_RANGE):
+            chunk_end = min(end_slot, chunk_start + GET_BLOCKS_MAX_RANGE - 1)
+            params = [chunk_start, chunk_end, {"commitment": commitment}] if commitment else [chunk_start, chunk_end]
+            response = self.make_rpc_request(rpc, "getBlocks", params)
+            try:
+                result = response.json()["result"] if response else None
+            except (ValueError, KeyError):
+                result = None
+            
+            if not isinstance(result, list):
+                logging.warning(f"getBlocks查询失败，逐个获取slot {chunk_start} - {end_slot}")
+                return produced + list(range(chunk_start, end_slot + 1)), end_slot
+            produced.extend(result)
+        
+        covered_slot = produced[-1] if produced else start_slot - 1
+        skipped = covered_slot - start_slot + 1 - len(produced)
+        if skipped:
+            self.gap_tracker.count_skipped(skipped)
+        return produced, covered_slot
+
+    def get_best_rpc(self):
+        """获取最佳RPC节点: 直接取健康探测排好序的快照"""
+        ranked = self.ranked_nodes
+        if ranked:
+            return ranked[0]
+        
+        # 首轮探测尚未完成时同步探测一次
+        self.probe_once()
+        if self.ranked_nodes:
+            return self.ranked_nodes[0]
+        
+        default_node = "https://api.mainnet-beta.solana.com"
+        logging.warning(f"所有节点不可用，使用默认节点: {default_node}")
+        return default_node
+
+    def probe_node(self, node):
+        """用getSlot探测单个节点，返回 (slot, 延迟秒数)，失败时slot为None
+        
+        探测不占用采集请求的在途名额，也不等待令牌桶: 令牌不足(或节点正被限流惩罚)时
+        本轮跳过该节点，返回 (None, None)，避免一个节点拖住整轮探测
+        """
+        if not self.get_rate_limiter(node).try_acquire():
+            return None, None
+        start_time = time.time()
+        try:
+            response = self.http.post(
+                node,
+                json={"jsonrpc": "2.0", "id": 1, "method": "getSlot"},
+                proxies=self.get_next_proxy(),
+                timeout=3,
+                verify=False
+            )
+            latency = time.time() - start_time
+            return response.json()["result"], latency
+        except Exception:
+            return None, time.time() - start_time
+
+    def probe_once(self):
+        """并行探测所有节点，更新EWMA延迟、错误率和slot落后数后重新排序"""
+        nodes = list(self.rpc_nodes)
+        results = list(self.probe_executor.map(self.probe_node, nodes))
+        slots = [slot for slot, _ in results if slot is not None]
+        cluster_slot = max(slots) if slots else None
+        
+        with self.health_lock:
+            for node, (slot, latency) in zip(nodes, results):
+                if latency is None:
+                    # 本轮未探测，保留上次的健康数据
+                    continue
+                health = self.node_health.setdefault(node, {"latency": None, "error_rate": 0.0, "slot": None, "lag": 0})
+                health["error_rate"] = health["error_rate"] * 0.7 + (0.3 if slot is None else 0)
+                if slot is None:
+                    continue
+                
+                health["latency"] = latency if health["latency"] is None else health["latency"] * 0.7 + latency * 0.3
+                health["slot"] = slot
+                health["lag"] = cluster_slot - slot
+        
+        self.rank_nodes()
 
-    def get_best_rpc(self):
-        """获取最佳RPC节点"""
-        current_time = time.time()
-        
-        # 检查是否需要切换节点
-        if (self.current_rpc and 
-            self.rpc_nodes[self.current_rpc]["fails"] < self.max_fails and 
-            current_time - self.last_rpc_switch < self.rpc_switch_interval):
-            return self.current_rpc
-        
-        # 按权重和失败次数排序节点
-        available_nodes = sorted(
-            self.rpc_nodes.items(),
-            key=lambda x: (x[1]["fails"], -x[1]["weight"], x[1]["last_used"])
-        )
+    def node_score(self, node):
+        """节点得分(越小越好): EWMA延迟按错误率放大，每落后一个slot加0.4秒，再除以配置权重"""
+        health = self.node_health[node]
+        score = health["latency"] * (1 + 4 * health["error_rate"]) + health["lag"] * 0.4
+        return score / max(0.1, self.rpc_nodes[node]["weight"])
+
+    def rank_nodes(self):
+        """生成排序后的节点快照，落后过多或连续失败的节点排在最后"""
+        with self.health_lock:
+            candidates = [
+                node for node in list(self.rpc_nodes)
+                if self.node_health.get(node, {}).get("latency") is not None
+            ]
+            candidates.sort(key=lambda node: (
+                self.rpc_nodes[node]["fails"] >= self.max_fails,
+                self.node_health[node]["lag"] >= self.max_slot_lag,
+                self.node_score(node)
+            ))
+            self.ranked_nodes = tuple(candidates)
         
-        # 测试节点直到找到可用的
-        for node, info in available_nodes:
+        if candidates and candidates[0] != self.current_rpc:
+            health = self.node_health[candidates[0]]
+            logging.info(f"使用RPC节点: {candidates[0]} (延迟: {health['latency'] * 1000:.1f}ms, "
+                         f"落后: {health['lag']} slot, 错误率: {health['error_rate']:.1%})")
+            self.current_rpc = candidates[0]
+
+    def probe_nodes(self):
+        """后台持续探测节点健康状况"""
+        while True:
             try:
-                logging.info(f"测试RPC节点: {node}")
-                response = self.make_rpc_request(node, "getHealth")
-                
-                if response and response.status_code == 200:
-                    # 更新节点状态
-                    self.rpc_nodes[node]["fails"] = 0
-                    self.rpc_nodes[node]["last_used"] = current_time
-                    self.current_rpc = node
-                    self.last_rpc_switch = current_time
-                    
-                    # 测试延迟
-                    start_time = time.time()
-                    self.make_rpc_request(node, "getHealth")
-                    latency = (time.time() - start_time) * 1000
-                    
-                    # 根据延迟调整权重
-                    if latency < 100:
-                        self.rpc_nodes[node]["weight"] += 0.1
-                    elif latency > 500:
-                        self.rpc_nodes[node]["weight"] = max(0.1, self.rpc_nodes[node]["weight"] - 0.1)
-                    
-                    logging.info(f"使用RPC节点: {node} (延迟: {latency:.1f}ms, 权重: {self.rpc_nodes[node]['weight']:.1f})")
-                    return node
-                
+                self.probe_once()
             except Exception as e:
-                logging.warning(f"节点 {node} 测试失败: {str(e)}")
-                self.rpc_nodes[node]["fails"] += 1
-                continue
-        
-        # 如果所有节点都失败，重置失败计数并返回默认节点
-        for node in self.rpc_nodes:
-            self.rpc_nodes[node]["fails"] = 0
-        
-        default_node = "https://api.mainnet-beta.solana.com"
-        logging.warning(f"所有节点不可用，使用默认节点: {default_node}")
-        return default_node
+                logging.error(f"节点健康探测失败: {str(e)}")
+            time.sleep(self.probe_interval)
 
     def handle_rpc_error(self, node, error):
         """处理RPC错误"""
         if node in self.rpc_nodes:
             self.rpc_nodes[node]["fails"] += 1
+            with self.health_lock:
+                health = self.node_health.get(node)
+                if health:
+                    health["error_rate"] = health["error_rate"] * 0.7 + 0.3
             if self.rpc_nodes[node]["fails"] >= self.max_fails:
-                logging.warning(f"节点 {node} 失败次数过多，将在下次切换节点")
-                self.last_rpc_switch = 0  # 强制下次切换节点
+                logging.warning(f"节点 {node} 失败次数过多，切换节点")
+            self.rank_nodes()
 
     def fetch_token_info(self, mint):
         """获取代币详细信息"""
@@ -370,7 +2716,7 @@ class TokenMonitor:
             
             # 获取基本信息
             url = f"https://public-api.birdeye.so/public/token_metadata?address={mint}"
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = self.http.get(url, headers=headers, timeout=5)
             data = resp.json()
             
             if data.get("success"):
@@ -378,7 +2724,7 @@ class TokenMonitor:
                 
                 # 获取持有人信息
                 holders_url = f"https://public-api.birdeye.so/public/token_holders?address={mint}"
-                holders_resp = requests.get(holders_url, headers=headers, timeout=5)
+                holders_resp = self.http.get(holders_url, headers=headers, timeout=5)
                 holders_data = holders_resp.json().get("data", [])
                 
                 # 计算持有人集中度
@@ -418,18 +2764,22 @@ class TokenMonitor:
         }
 
     def analyze_creator_history(self, creator):
-        """分析创建者历史记录"""
+        """分析创建者历史记录，同一创建者的并发调用共享一次查询"""
+        # 检查缓存
+        history = self.get_cached_data('creator_history', creator)
+        if history is not None:
+            logging.info(f"使用缓存的创建者历史: {creator}")
+            return history
+        
+        return self.inflight.do('creator_history', creator, self.fetch_creator_history, creator,
+                                check=lambda creator: self.get_cached_data('creator_history', creator))
+
+    def fetch_creator_history(self, creator):
+        """查询创建者历史发行的代币并写入缓存"""
         try:
-            # 检查缓存
-            if creator in self.cache['creator_history']:
-                cache_data = self.cache['creator_history'][creator]
-                if time.time() - cache_data['timestamp'] < self.cache_expire['creator_history']:
-                    logging.info(f"使用缓存的创建者历史: {creator}")
-                    return cache_data['history']
-            
             headers = {"X-API-KEY": self.get_next_api_key()}
             url = f"https://public-api.birdeye.so/public/address_nft_mints?address={creator}"
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = self.http.get(url, headers=headers, timeout=5)
             data = resp.json()
             
             if data.get("success"):
@@ -439,17 +2789,8 @@ class TokenMonitor:
                         token_info = self.fetch_token_info(tx["mint"])
                         
                         # 获取历史最高市值
-                        max_market_cap = 0
-                        try:
-                            history_url = f"https://public-api.birdeye.so/public/token_price_history?address={tx['mint']}"
-                            history_resp = requests.get(history_url, headers=headers, timeout=5)
-                            if history_resp.status_code == 200:
-                                price_history = history_resp.json().get("data", [])
-                                if price_history:
-                                    max_price = max(float(p.get("value", 0)) for p in price_history)
-                                    max_market_cap = max_price * token_info["supply"]
-                        except Exception as e:
-                            logging.warning(f"获取价格历史失败: {str(e)}")
+                        max_price = self.fetch_max_price(tx["mint"], headers)
+                        max_market_cap = max_price * token_info["supply"]
                         
                         history.append({
                             "mint": tx["mint"],
@@ -463,10 +2804,7 @@ class TokenMonitor:
                         })
                 
                 # 缓存结果
-                self.cache['creator_history'][creator] = {
-                    'timestamp': time.time(),
-                    'history': history
-                }
+                self.set_cached_data('creator_history', creator, history)
                 logging.info(f"分析创建者历史成功: {creator}, 发现 {len(history)} 个代币")
                 return history
         except Exception as e:
@@ -475,6 +2813,24 @@ class TokenMonitor:
         
         return []
 
+    def fetch_max_price(self, mint, headers):
+        """获取代币历史最高价格，结果写入缓存"""
+        cached = self.get_cached_data('price_history', mint)
+        if cached is not None:
+            return cached
+        
+        try:
+            history_url = f"https://public-api.birdeye.so/public/token_price_history?address={mint}"
+            history_resp = self.http.get(history_url, headers=headers, timeout=5)
+            if history_resp.status_code == 200:
+                price_history = history_resp.json().get("data", [])
+                max_price = max((float(p.get("value", 0)) for p in price_history), default=0)
+                self.set_cached_data('price_history', mint, max_price)
+                return max_price
+        except Exception as e:
+            logging.warning(f"获取价格历史失败: {str(e)}")
+        return 0
+
     def analyze_creator_relations(self, creator):
         """分析创建者地址关联性"""
         try:
@@ -486,7 +2842,7 @@ class TokenMonitor:
             # 1. 分析转账历史
             headers = {"X-API-KEY": self.get_next_api_key()}
             url = f"https://public-api.birdeye.so/public/address_activity?address={creator}"
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = self.http.get(url, headers=headers, timeout=5)
             data = resp.json()
             
             if data.get("success"):
@@ -598,7 +2954,7 @@ class TokenMonitor:
         """分析共同签名者（辅助函数）"""
         try:
             tx_url = f"https://public-api.solscan.io/account/transactions?account={address}"
-            tx_resp = requests.get(tx_url, timeout=5)
+            tx_resp = self.http.get(tx_url, timeout=5)
             tx_data = tx_resp.json()
             
             cosigner_relations = []
@@ -817,7 +3173,7 @@ class TokenMonitor:
                 "💡 投资建议",
                 "┣━ ⚠️ 新钱包创建,需谨慎对待" if relations['is_new_wallet'] else "┣━ 📅 老钱包,历史可查",
                 "┣━ 🌟 资金来源包含多个成功代币创建者" if relations['high_value_relations'] else "┣━ ⚠️ 无明显成功项目背景",
-                f"┣━ 💰 上游最高市值项目: ${format_number(max(t['market_cap'] for r in relations['high_value_relations'] for t in r.get('success_tokens', [0])))} (LUNA)",
+                f"┣━ 💰 上游最高市值项目: ${format_number(max((t['market_cap'] for r in relations['high_value_relations'] for t in r.get('success_tokens', [])), default=0))} (LUNA)",
                 "┗━ ❗ 建议重点关注此项目" if relations['risk_score'] < 70 and relations['high_value_relations'] else "┗━ ❗ 建议谨慎对待"
             ])
 
@@ -843,7 +3199,7 @@ class TokenMonitor:
         # Server酱推送
         for key in self.config["serverchan"]["keys"]:
             try:
-                response = requests.post(
+                response = self.http.post(
                     f"https://sctapi.ftqq.com/{key}.send",
                     data={"title": "Solana新代币提醒", "desp": msg},
                     timeout=5
@@ -868,6 +3224,14 @@ class TokenMonitor:
 
     def start_worker_threads(self):
         """启动更多工作线程"""
+        # 区块解码进程池: JSON解码和交易扫描是CPU密集型，放到独立进程以避开GIL
+        processes = self.ingest_config['decode_processes']
+        if processes > 0 and self.ingest_config['decode_ring_mb'] > 0:
+            self.decode_ring = SharedRingBuffer(self.ingest_config['decode_ring_mb'] * 1024 * 1024, get_process_context())
+        self.decode_pool = create_decode_pool(processes, self.decode_ring)
+        if self.decode_pool:
+            logging.info(f"区块解码进程数: {processes}, 环形缓冲区: {self.ingest_config['decode_ring_mb']}MB")
+        
         # 启动区块处理线程
         for _ in range(10):
             Thread(target=self.process_blocks, daemon=True).start()
@@ -880,38 +3244,97 @@ class TokenMonitor:
         for _ in range(3):
             Thread(target=self.process_results, daemon=True).start()
 
+    def enqueue_block(self, slot, block_data, priority=0):
+        """把区块放入处理队列(priority: 0实时, 1补采)"""
+        self.tx_queue.put((priority, slot, next(self.tx_seq), block_data))
+
     def process_blocks(self):
         """处理区块数据"""
         while True:
+            _, slot, _, block_data = self.tx_queue.get()
             try:
-                block_data = self.tx_queue.get()
                 if not block_data:
                     continue
                 
+                # 原始字节先做预过滤，只解码命中的交易
+                if isinstance(block_data, bytes):
+                    events, decoded_bytes = self.decode_block(block_data)
+                    self.metrics['decoded_bytes'] += decoded_bytes
+                    self.metrics['skipped_bytes'] += len(block_data) - decoded_bytes
+                    for mint, creator in events:
+                        self.emit_event(mint, creator)
+                    continue
+                
                 block = block_data.get("result")
                 if not block or "transactions" not in block:
                     continue
                 
                 for tx in block["transactions"]:
-                    if "transaction" not in tx or "message" not in tx["transaction"]:
-                        continue
-                        
-                    account_keys = tx["transaction"]["message"].get("accountKeys", [])
-                    if self.PUMP_PROGRAM in account_keys:
-                        creator = account_keys[0]
-                        mint = account_keys[4]
-                        self.result_queue.put((mint, creator))
-                        self.metrics['processed_txs'] += 1
+                    for mint, creator in decode_pump_creates(tx, self.alt_cache.resolve):
+                        self.emit_event(mint, creator)
                     
             except Exception as e:
                 logging.error(f"处理区块失败: {str(e)}")
                 continue
+            finally:
+                self.checkpoint.done(slot)
+
+    def decode_block(self, raw):
+        """解码区块原始字节，返回 (事件列表, 实际解码的字节数)
+        
+        不含Pump程序的区块直接在本线程跳过，只有命中的区块才交给解码进程池，
+        区块经共享内存环形缓冲区传入，进程间只传回紧凑的事件记录。
+        """
+        pool = self.decode_pool
+        if pool is None or PUMP_PROGRAM_BYTES not in raw:
+            return extract_block_events(raw, self.json_decoder, self.alt_cache.resolve)
+        
+        ring = self.decode_ring
+        try:
+            if ring and ring.record_size(len(raw)) <= ring.capacity:
+                # 在途区块占满缓冲区时阻塞，对下载形成背压
+                pos = ring.write(raw)
+                try:
+                    packed, decoded_bytes, unresolved = pool.submit(decode_ring_record, pos, self.json_decoder.name).result()
+                finally:
+                    ring.release(pos)
+            else:
+                packed, decoded_bytes, unresolved = pool.submit(decode_block_in_worker, raw, self.json_decoder.name).result()
+        except (BrokenProcessPool, OSError) as e:
+            # 工作进程异常退出或共享内存不可用时进程池不可再用，退回线程内解码
+            logging.error(f"解码进程池失败，改为线程内解码: {str(e)}")
+            self.decode_pool = None
+            pool.shutdown(wait=False)
+            return extract_block_events(raw, self.json_decoder, self.alt_cache.resolve)
+        except Exception as e:
+            # 单个区块在工作进程中解码出错(如数据截断)，只把这个区块改在线程内解码，进程池继续使用
+            logging.warning(f"解码进程处理区块出错，本区块改为线程内解码: {str(e)}")
+            return extract_block_events(raw, self.json_decoder, self.alt_cache.resolve)
+        
+        self.metrics['pool_decoded_blocks'] += 1
+        if unresolved:
+            # 交易引用了未在loadedAddresses中给出的查找表，使用主进程的查找表缓存重新解码
+            self.metrics['pool_fallbacks'] += 1
+            return extract_block_events(raw, self.json_decoder, self.alt_cache.resolve)
+        return unpack_events(packed), decoded_bytes
+
+    def emit_event(self, mint, creator):
+        """把新币事件放入结果队列，同一mint只输出一次"""
+        with self.emitted_lock:
+            if mint in self.emitted_mints:
+                return False
+            self.emitted_mints[mint] = time.time()
+            while len(self.emitted_mints) > 100000:
+                self.emitted_mints.popitem(last=False)
+        self.result_queue.put((mint, creator))
+        self.metrics['processed_txs'] += 1
+        return True
 
     def process_results(self):
-        """处理分析结果"""
+        """处理分析结果，从alert_queue取出警报数据格式化后推送"""
         while True:
             try:
-                result = self.result_queue.get()
+                result = self.alert_queue.get()
                 if not result:
                     continue
                 
@@ -931,22 +3354,64 @@ class TokenMonitor:
                 blocks_per_second = self.metrics['processed_blocks'] / duration if duration > 0 else 0
                 txs_per_second = self.metrics['processed_txs'] / duration if duration > 0 else 0
                 avg_delay = sum(self.metrics['processing_delays']) / len(self.metrics['processing_delays']) if self.metrics['processing_delays'] else 0
+                total_bytes = self.metrics['decoded_bytes'] + self.metrics['skipped_bytes']
+                skip_ratio = self.metrics['skipped_bytes'] / total_bytes if total_bytes else 0
+                hedge_rate = self.metrics['hedge_sent'] / self.metrics['hedge_requests'] if self.metrics['hedge_requests'] else 0
                 
                 logging.info(f"性能指标 - "
                             f"区块处理速度: {blocks_per_second:.2f}/s, "
                             f"交易处理速度: {txs_per_second:.2f}/s, "
                             f"平均延迟: {avg_delay:.2f}s, "
-                            f"丢失区块: {len(self.metrics['missed_blocks'])}")
+                            f"丢失区块: {len(self.gap_tracker)} (区间 {len(self.gap_tracker.intervals)}, "
+                            f"已恢复 {self.gap_tracker.stats['recovered']}, 已跳过 {self.gap_tracker.stats['skipped']}, "
+                            f"已放弃 {self.gap_tracker.stats['abandoned'] + self.gap_tracker.stats['dropped']}), "
+                            f"解码/跳过字节: {format_number(self.metrics['decoded_bytes'])}/{format_number(self.metrics['skipped_bytes'])} "
+                            f"(跳过率 {skip_ratio:.1%}), "
+                            f"进程池解码区块: {self.metrics['pool_decoded_blocks']} (回退 {self.metrics['pool_fallbacks']}"
+                            f"{f', 环形缓冲区占用 {format_number(self.decode_ring.used())}' if self.decode_ring else ''}), "
+                            f"对冲请求: {hedge_rate:.1%} (胜出 {self.metrics['hedge_wins']}, 浪费 {self.metrics['hedge_wasted']}), "
+                            f"getSlot轮询: {self.metrics['slot_polls'] / duration if duration > 0 else 0:.2f}/s "
+                            f"(出块间隔 {self.slot_clock.slot_time * 1000:.0f}ms)")
+                
+                # 缓存命中和占用情况
+                self.cache.purge_expired()
+                for namespace, usage in self.cache.usage().items():
+                    stats = self.cache.stats[namespace]
+                    lookups = stats['hits'] + stats['disk_hits'] + stats['stale'] + stats['misses']
+                    logging.info(f"缓存 {namespace} - 条目: {usage['entries']}, 占用: {format_number(usage['bytes'])}B, "
+                                 f"命中率: {(stats['hits'] + stats['disk_hits']) / lookups if lookups else 0:.1%} (磁盘 {stats['disk_hits']}), "
+                                 f"返回旧值: {stats['stale']}, 过期: {stats['expired']}, 淘汰: {stats['evictions']}")
+                logging.info(f"代币信息后台刷新: {self.metrics['token_revalidations']}")
+                
+                # 并发查询合并情况
+                for namespace, stats in list(self.inflight.stats.items()):
+                    total = stats['calls'] + stats['shared']
+                    logging.info(f"请求合并 {namespace} - 实际请求: {stats['calls']}, 共享结果: {stats['shared']}, "
+                                 f"复查缓存命中: {stats['cached']} (合并率 {stats['shared'] / total if total else 0:.1%})")
+                
+                # 代币信息批量查询情况
+                batch_stats = self.token_batcher.stats
+                if batch_stats['batches']:
+                    logging.info(f"代币信息批量查询 - 查询: {batch_stats['requests']}, 请求: {batch_stats['batches']}, "
+                                 f"平均批次: {batch_stats['keys'] / batch_stats['batches']:.1f}, "
+                                 f"当前窗口: {self.token_batcher.window() * 1000:.1f}ms")
+                
+                # 各主机的连接复用情况
+                for host, stats in self.http.stats().items():
+                    logging.info(f"连接池 {host} - 本周期请求: {stats['requests']}, 新建连接: {stats['connections']}, 复用率: {stats['reuse']:.1%}")
+                
+                # 保存学习到的节点并发和速率
+                self.save_node_limits()
                 
                 # 重置计数器
                 self.metrics['processed_blocks'] = 0
                 self.metrics['processed_txs'] = 0
+                self.metrics['decoded_bytes'] = 0
+                self.metrics['skipped_bytes'] = 0
                 self.metrics['last_process_time'] = now
                 self.metrics['processing_delays'] = []
-                
-                # 尝试重新处理丢失的区块
-                if self.metrics['missed_blocks']:
-                    self.retry_missed_blocks()
+                for key in ('pool_decoded_blocks', 'pool_fallbacks', 'slot_polls', 'hedge_requests', 'hedge_sent', 'hedge_wins', 'hedge_wasted'):
+                    self.metrics[key] = 0
                 
                 time.sleep(60)  # 每分钟输出一次指标
                 
@@ -955,88 +3420,692 @@ class TokenMonitor:
                 time.sleep(60)
 
     def retry_missed_blocks(self):
-        """重试处理丢失的区块"""
-        if not self.metrics['missed_blocks']:
-            return
+        """持续重试丢失的区块，只取退避时间已到的slot"""
+        while True:
+            try:
+                retry_slots = self.gap_tracker.due(self.block_batch_size)
+                if not retry_slots:
+                    time.sleep(0.5)
+                    continue
+                
+                logging.info(f"重试 {len(retry_slots)} 个丢失区块 (剩余缺口: {len(self.gap_tracker)})")
+                self.fetch_slots_batched(sorted(retry_slots), priority=1)
+                
+            except Exception as e:
+                logging.error(f"重试丢失区块失败: {str(e)}")
+                time.sleep(1)
+
+    def record_block_result(self, slot, block_data):
+        """根据getBlock结果更新缺口跟踪，返回区块是否可用"""
+        if isinstance(block_data, bytes) or (block_data and block_data.get("result")):
+            self.gap_tracker.resolve(slot)
+            return True
+        
+        if is_skipped_slot_error(block_data):
+            self.gap_tracker.mark_skipped(slot)
+        else:
+            self.gap_tracker.add(slot)
+        self.checkpoint.done(slot)
+        return False
+
+    def get_shard_nodes(self, priority):
+        """返回可参与分片下载的健康节点，未启用分片时返回空列表"""
+        mode = self.ingest_config['shard_slots']
+        if mode == 'off' or (mode == 'catchup' and priority == 0):
+            return []
+        
+        return [
+            node for node in self.ranked_nodes
+            if node in self.rpc_nodes
+            and self.rpc_nodes[node]["fails"] < self.max_fails
+            and self.node_health.get(node, {}).get("lag", 0) < self.max_slot_lag
+        ]
+
+    def node_capacity(self, node):
+        """节点下载能力(请求/秒): 令牌桶速率与 在途上限/延迟 中的较小值"""
+        latency = self.node_health.get(node, {}).get("latency") or self.ingest_config['hedge_default_delay']
+        return min(self.get_rate_limiter(node).rate, self.get_concurrency_limiter(node).limit / latency)
+
+    def assign_shards(self, slots, nodes):
+        """按节点容量比例把slot切成连续的分片，返回 {节点: slot列表}"""
+        capacities = [self.node_capacity(node) for node in nodes]
+        total = sum(capacities)
+        shards = {}
+        start = 0
+        acc = 0.0
+        for node, capacity in zip(nodes, capacities):
+            acc += capacity
+            end = len(slots) if node == nodes[-1] else int(round(len(slots) * acc / total))
+            if end > start:
+                shards[node] = slots[start:end]
+            start = end
+        return shards
+
+    def fetch_slots_sharded(self, slots, nodes, priority=0, commitment=None):
+        """把slot按容量分给多个节点并行下载，失败的slot下一轮重新分片
+        
+        slot被跳过(-32007/-32009)视为成功；节点累计有max_fails轮出现失败才不再参与分片，
+        偶发的单个slot失败不会减少下载容量。
+        """
+        pending = list(slots)
+        node_failures = {}
+        
+        while pending and nodes:
+            shards = self.assign_shards(pending, nodes)
+            pending = []
+            failed_nodes = set()
+            
+            with ThreadPoolExecutor(max_workers=self.parallel_requests) as executor:
+                futures = []
+                for node, shard in shards.items():
+                    batch_size = self.request_limits.get(node, self.request_limits["default"])["max_batch"]
+                    for start in range(0, len(shard), batch_size):
+                        batch = shard[start:start + batch_size]
+                        futures.append((node, batch, executor.submit(self.fetch_blocks, node, batch, self.get_next_proxy(), commitment)))
+                
+                for node, batch, future in futures:
+                    try:
+                        blocks = future.result()
+                    except Exception as e:
+                        blocks = {}
+                        logging.error(f"分片获取区块失败 ({node}): {str(e)}")
+                    
+                    for slot in batch:
+                        block_data = blocks.get(slot)
+                        if isinstance(block_data, bytes) or (block_data and block_data.get("result")) or is_skipped_slot_error(block_data):
+                            if self.record_block_result(slot, block_data):
+                                self.enqueue_block(slot, block_data, priority)
+                                self.metrics['processed_blocks'] += 1
+                        else:
+                            failed_nodes.add(node)
+                            pending.append(slot)
+            
+            if pending:
+                for node in failed_nodes:
+                    node_failures[node] = node_failures.get(node, 0) + 1
+                nodes = [node for node in nodes if node_failures.get(node, 0) < self.max_fails]
+                if nodes:
+                    logging.info(f"{len(failed_nodes)} 个节点下载失败，{len(pending)} 个slot重新分配给 {len(nodes)} 个节点")
         
-        logging.info(f"开始重试处理 {len(self.metrics['missed_blocks'])} 个丢失区块")
+        # 所有节点都失败的slot交给丢失区块重试
+        for slot in pending:
+            self.record_block_result(slot, None)
+
+    def fetch_slots_batched(self, slots, priority=0, commitment=None):
+        """按JSON-RPC批次并行下载区块并放入处理队列，失败的slot记入丢失区块"""
+        self.checkpoint.begin(slots)
+        
+        # 启用分片且有多个健康节点时按容量分给各节点下载
+        nodes = self.get_shard_nodes(priority)
+        if len(nodes) > 1:
+            return self.fetch_slots_sharded(list(slots), nodes, priority, commitment)
         
-        retry_slots = list(self.metrics['missed_blocks'])
-        self.metrics['missed_blocks'].clear()
+        rpc = self.get_best_rpc()
+        batch_size = self.request_limits.get(rpc, self.request_limits["default"])["max_batch"]
         
         with ThreadPoolExecutor(max_workers=self.parallel_requests) as executor:
             futures = []
-            for slot in retry_slots:
-                future = executor.submit(
-                    self.parallel_rpc_request,
+            for start in range(0, len(slots), batch_size):
+                batch = list(slots[start:start + batch_size])
+                future = executor.submit(self.fetch_blocks, rpc, batch, self.get_next_proxy(), commitment)
+                futures.append((batch, future))
+            
+            for batch, future in futures:
+                try:
+                    blocks = future.result()
+                except Exception as e:
+                    blocks = {}
+                    logging.error(f"批量获取区块失败: {str(e)}")
+                
+                for slot in batch:
+                    block_data = blocks.get(slot)
+                    if self.record_block_result(slot, block_data):
+                        self.enqueue_block(slot, block_data, priority)
+                        self.metrics['processed_blocks'] += 1
+
+    def plan_catchup(self, current_slot):
+        """根据检查点规划重启后的补采范围，返回 (实时采集起点, 待补采slot列表)"""
+        resume_slot = self.checkpoint.saved_slot
+        live_start = current_slot - 1
+        if not resume_slot or resume_slot >= live_start:
+            if not resume_slot:
+                logging.info("没有slot检查点，从最新slot开始采集")
+            return max(resume_slot, live_start), []
+        
+        catchup_start = max(resume_slot + 1, live_start - self.ingest_config['catchup_max_slots'] + 1)
+        if catchup_start > resume_slot + 1:
+            logging.warning(f"缺口超过补采预算，跳过slot {resume_slot + 1} - {catchup_start - 1}")
+        
+        slots, _ = self.get_produced_slots(self.get_best_rpc(), catchup_start, live_start)
+        # 先登记补采范围，保证检查点低水位不会越过未补采的slot
+        self.checkpoint.begin(slots)
+        logging.info(f"从检查点 {resume_slot} 恢复，补采 {len(slots)} 个slot")
+        return live_start, slots
+
+    def run_catchup(self, slots):
+        """后台补采缺口，只在实时采集空闲时下载，区块以低优先级入队"""
+        start_time = time.time()
+        for start in range(0, len(slots), self.block_batch_size):
+            self.live_idle.wait()
+            self.fetch_slots_batched(slots[start:start + self.block_batch_size], priority=1)
+            self.checkpoint.save(self.ingest_config['checkpoint_interval'], self.gap_tracker.snapshot())
+        
+        elapsed = time.time() - start_time
+        logging.info(f"补采完成: {len(slots)} 个slot, 耗时 {elapsed:.1f}s ({len(slots) / max(elapsed, 0.001):.1f} slot/s)")
+
+    def monitor_async(self):
+        """asyncio采集模式: 单事件循环, 每节点持久连接池, 固定在途请求数"""
+        if aiohttp is None:
+            logging.warning("未安装aiohttp，回退到线程池采集模式")
+            return False
+        
+        logging.info(f"asyncio采集模式启动 (在途请求数: {self.ingest_config['max_inflight']})")
+        asyncio.run(self._async_ingest_loop())
+        return True
+
+    def _get_async_session(self, sessions, node):
+        """获取节点的持久会话(每个节点一个连接池)"""
+        session = sessions.get(node)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.ingest_config['pool_size'],
+                keepalive_timeout=60,
+                ssl=False
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.ingest_config['request_timeout'])
+            )
+            sessions[node] = session
+        return session
+
+    async def _async_rpc_request(self, session, node, method, params=None, raw=False):
+        """在事件循环中发送RPC请求，raw=True时区块结果保留原始字节"""
+        await self.get_concurrency_limiter(node).acquire_async()
+        outcome = {"failed": True}
+        try:
+            await self.get_rate_limiter(node).acquire_async()
+            start_time = time.time()
+            async with session.post(
+                node,
+                json={
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": method,
+                    "params": params or []
+                },
+                proxy=self.get_proxy_url()
+            ) as response:
+                if response.status == 429:
+                    logging.warning(f"节点 {node} 触发请求限制")
+                    outcome["throttled"] = True
+                    self.get_rate_limiter(node).penalize(self.request_limits.get(node, self.request_limits["default"])["burst_wait"])
+                    self.handle_rpc_error(node, "Rate limit exceeded")
+                    return None
+                if response.status != 200:
+                    return None
+                outcome = {"latency": time.time() - start_time, "failed": False}
+                if raw:
+                    return raw_or_decoded(await response.read())
+                return await response.json(content_type=None)
+                
+        except asyncio.TimeoutError:
+            logging.warning(f"异步请求超时: {node}")
+            outcome["throttled"] = True
+            return None
+        except Exception as e:
+            logging.warning(f"异步请求失败: {str(e)}")
+            self.handle_rpc_error(node, str(e))
+            return None
+        finally:
+            self.node_request_done(node, latency_budget=self.ingest_config['request_timeout'] / 2, **outcome)
+
+    async def _async_block_worker(self, slot_queue, sessions):
+        """区块下载协程，每个协程同一时刻只有一个在途请求"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            priority, slot = await slot_queue.get()
+            try:
+                rpc = self.current_rpc or await loop.run_in_executor(None, self.get_best_rpc)
+                session = self._get_async_session(sessions, rpc)
+                
+                start_time = time.time()
+                block_data = await self._async_rpc_request(
+                    session,
+                    rpc,
                     "getBlock",
-                    [slot, {"encoding":"json","transactionDetails":"full"}]
+                    [slot, {"encoding":"json","transactionDetails":"full","maxSupportedTransactionVersion":0}],
+                    raw=True
                 )
-                futures.append((slot, future))
-            
-            for slot, future in futures:
+                
+                if self.record_block_result(slot, block_data):
+                    item = (priority, slot, next(self.tx_seq), block_data)
+                    try:
+                        self.tx_queue.put_nowait(item)
+                    except Full:
+                        # 队列已满时在线程中等待，避免阻塞事件循环
+                        await loop.run_in_executor(None, self.tx_queue.put, item)
+                    self.metrics['processed_blocks'] += 1
+                    self.metrics['processing_delays'].append(time.time() - start_time)
+                    
+            except Exception as e:
+                self.gap_tracker.add(slot)
+                self.checkpoint.done(slot)
+                logging.error(f"处理区块 {slot} 失败: {str(e)}")
+            finally:
+                slot_queue.task_done()
+
+    async def _async_ingest_loop(self):
+        """轮询最新slot并把待下载区块交给固定数量的下载协程"""
+        loop = asyncio.get_running_loop()
+        sessions = {}
+        # 按 (优先级, slot) 出队，实时slot优先于补采slot
+        slot_queue = asyncio.PriorityQueue()
+        workers = [
+            asyncio.create_task(self._async_block_worker(slot_queue, sessions))
+            for _ in range(self.ingest_config['max_inflight'])
+        ]
+        last_slot = 0
+        
+        try:
+            while True:
                 try:
-                    response = future.result()
-                    if response and response.status_code == 200:
-                        self.tx_queue.put(response.json())
-                    else:
-                        self.metrics['missed_blocks'].add(slot)
+                    # 节点选择可能发起同步探测请求，放到线程中执行
+                    rpc = await loop.run_in_executor(None, self.get_best_rpc)
+                    session = self._get_async_session(sessions, rpc)
+                    
+                    # 在预计出块时刻轮询，未出现新slot时短间隔再查
+                    await asyncio.sleep(self.slot_clock.delay_until_next() or self.slot_clock.slot_time / 8)
+                    response = await self._async_rpc_request(session, rpc, "getSlot")
+                    self.metrics['slot_polls'] += 1
+                    if not response or "result" not in response:
+                        continue
+                    
+                    current_slot = response["result"]
+                    self.slot_clock.observe(current_slot)
+                    if last_slot == 0:
+                        last_slot, catchup_slots = self.plan_catchup(current_slot)
+                        for slot in catchup_slots:
+                            slot_queue.put_nowait((1, slot))
+                    
+                    if current_slot <= last_slot:
+                        continue
+                    
+                    # 只下载实际出块的slot
+                    live_slots, covered_slot = await loop.run_in_executor(
+                        None, self.get_produced_slots, rpc, last_slot + 1, current_slot
+                    )
+                    self.checkpoint.begin(live_slots)
+                    self.checkpoint.advance(covered_slot)
+                    for slot in live_slots:
+                        slot_queue.put_nowait((0, slot))
+                    last_slot = max(last_slot, covered_slot)
+                    
+                    self.checkpoint.save(self.ingest_config['checkpoint_interval'], self.gap_tracker.snapshot())
+                    
                 except Exception as e:
-                    self.metrics['missed_blocks'].add(slot)
-                    logging.error(f"重试区块 {slot} 失败: {str(e)}")
+                    logging.error(f"异步监控循环错误: {str(e)}")
+                    await asyncio.sleep(1)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            for session in sessions.values():
+                await session.close()
+
+    def fetch_new_signatures(self, rpc, until=None):
+        """获取PUMP_PROGRAM在until之后的新签名(新->旧)，失败返回None"""
+        limit = self.ingest_config['signature_limit']
+        signatures = []
+        before = None
+        
+        while True:
+            options = {"limit": limit, "commitment": "confirmed"}
+            if until:
+                options["until"] = until
+            if before:
+                options["before"] = before
+            
+            response = self.make_rpc_request(rpc, "getSignaturesForAddress", [PUMP_PROGRAM, options], self.get_next_proxy())
+            if not response or response.status_code != 200:
+                return None
+            
+            page = response.json().get("result")
+            if page is None:
+                return None
+            signatures.extend(page)
+            
+            # 首次轮询只取最新一页; 之后翻页直到追上游标
+            if len(page) < limit or not until:
+                break
+            if len(signatures) >= self.ingest_config['max_signature_backlog']:
+                logging.warning(f"待补采签名超过 {len(signatures)} 条，跳过更早的签名")
+                break
+            before = page[-1]["signature"]
+        
+        return signatures
+
+    def monitor_signatures(self):
+        """按程序地址采集: 轮询PUMP_PROGRAM的签名，只下载相关交易
+        
+        游标越过的签名如果getTransaction没有取到结果，留在retry_signatures中下一轮重试，
+        最多重试retry_max_attempts次。
+        """
+        logging.info("签名采集模式启动")
+        last_signature = None
+        retry_signatures = OrderedDict()  # 签名 -> 已失败次数，按时间顺序
+        
+        while True:
+            try:
+                rpc = self.get_best_rpc()
+                signatures = self.fetch_new_signatures(rpc, last_signature)
+                if signatures is None:
+                    self.handle_rpc_error(rpc, "getSignaturesForAddress failed")
+                    time.sleep(1)
+                    continue
+                
+                if signatures:
+                    first_poll = last_signature is None
+                    last_signature = signatures[0]["signature"]
+                    if first_poll:
+                        logging.info(f"签名游标初始化: {last_signature}")
+                        time.sleep(self.ingest_config['poll_interval'])
+                        continue
+                
+                # 按时间顺序处理成功的交易，先处理上一轮没有取到的签名
+                tx_signatures = list(retry_signatures) + [
+                    s["signature"] for s in reversed(signatures)
+                    if s.get("err") is None and s["signature"] not in retry_signatures
+                ]
+                if tx_signatures:
+                    start_time = time.time()
+                    responses = self.make_batch_rpc_request(
+                        rpc,
+                        "getTransaction",
+                        [[sig, {"encoding":"json","commitment":"confirmed","maxSupportedTransactionVersion":0}]
+                         for sig in tx_signatures],
+                        self.get_next_proxy()
+                    )
+                    
+                    for i, sig in enumerate(tx_signatures):
+                        tx = (responses.get(i) or {}).get("result")
+                        if not tx:
+                            attempts = retry_signatures.pop(sig, 0) + 1
+                            if attempts < self.ingest_config['retry_max_attempts']:
+                                retry_signatures[sig] = attempts
+                            else:
+                                logging.warning(f"交易多次获取失败，放弃: {sig}")
+                            continue
+                        retry_signatures.pop(sig, None)
+                        for mint, creator in decode_pump_creates(tx, self.alt_cache.resolve):
+                            self.emit_event(mint, creator)
+                    
+                    # 待重试签名过多时丢弃最旧的
+                    while len(retry_signatures) > self.ingest_config['max_signature_backlog']:
+                        sig, _ = retry_signatures.popitem(last=False)
+                        logging.warning(f"待重试签名过多，丢弃: {sig}")
+                    
+                    self.metrics['processing_delays'].append(time.time() - start_time)
+                
+                time.sleep(self.ingest_config['poll_interval'])
+                
+            except Exception as e:
+                logging.error(f"签名采集循环错误: {str(e)}")
+                time.sleep(1)
+
+    def get_ws_url(self, rpc):
+        """获取节点的WebSocket地址"""
+        if self.ingest_config['ws_url']:
+            return self.ingest_config['ws_url']
+        
+        ws_url = rpc.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        # 自建节点的WebSocket端口为8900
+        return ws_url.replace(":8899", ":8900")
+
+    def backfill_slots(self, from_slot):
+        """通过getBlock路径补齐from_slot之后到最新slot之间的区块
+        
+        logsSubscribe使用confirmed，补齐也必须用confirmed: 短暂断线时缺口内的slot还没有finalized，
+        按默认的finalized查询会得到空范围。新订阅已经推送过的create交易由emit_event按mint去重。
+        """
+        try:
+            response = self.parallel_rpc_request("getSlot", [{"commitment": "confirmed"}])
+            if not response:
+                return
+            
+            current_slot = response.json()["result"]
+            if current_slot > from_slot:
+                logging.info(f"补齐断线期间的区块: {from_slot + 1} - {current_slot}")
+                slots, _ = self.get_produced_slots(self.get_best_rpc(), from_slot + 1, current_slot, commitment="confirmed")
+                self.fetch_slots_batched(slots, commitment="confirmed")
+        except Exception as e:
+            logging.error(f"补齐区块失败: {str(e)}")
+
+    def handle_stream_signature(self, rpc, signature, notification):
+        """下载流式通知对应的交易并提取Pump事件"""
+        try:
+            response = self.make_rpc_request(
+                rpc,
+                "getTransaction",
+                [signature, {"encoding":"json","commitment":"confirmed","maxSupportedTransactionVersion":0}],
+                self.get_next_proxy()
+            )
+            tx = response.json().get("result") if response and response.status_code == 200 else None
+            if not tx:
+                logging.warning(f"获取交易 {signature} 失败")
+                return
+            
+            for mint, creator in decode_pump_creates(tx, self.alt_cache.resolve):
+                self.emit_event(mint, creator)
+            
+            if self.ingest_config['record_path']:
+                with self.record_lock:
+                    with open(self.ingest_config['record_path'], 'a') as f:
+                        f.write(json.dumps({
+                            "t": time.time(),
+                            "signature": signature,
+                            "notification": notification,
+                            "transaction": tx
+                        }) + "\n")
+                        
+        except Exception as e:
+            logging.error(f"处理流式交易 {signature} 失败: {str(e)}")
+
+    def monitor_logs(self, stop=None):
+        """WebSocket流式采集: logsSubscribe订阅PUMP_PROGRAM，断线重连后通过getBlock补齐缺口
+        
+        stop为可选的Event，设置后关闭连接即退出(用于回放基准测试)
+        """
+        if websocket is None:
+            logging.warning("未安装websocket-client，回退到轮询采集模式")
+            return False
+        
+        logging.info("WebSocket流式采集模式启动")
+        self.record_lock = Lock()
+        last_slot = 0
+        
+        while not (stop and stop.is_set()):
+            ws = None
+            rpc = None
+            try:
+                rpc = self.get_best_rpc()
+                ws_url = self.get_ws_url(rpc)
+                ws = websocket.create_connection(ws_url, timeout=self.ingest_config['ws_idle_timeout'])
+                ws.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "logsSubscribe",
+                    "params": [{"mentions": [PUMP_PROGRAM]}, {"commitment": "confirmed"}]
+                }))
+                
+                subscription = json.loads(ws.recv()).get("result")
+                if subscription is None:
+                    raise Exception("logsSubscribe订阅失败")
+                logging.info(f"logsSubscribe订阅成功: {ws_url} (订阅ID: {subscription})")
+                
+                # 重连后补齐断线期间的区块
+                if last_slot:
+                    self.executor.submit(self.backfill_slots, last_slot)
+                
+                while True:
+                    message = json.loads(ws.recv())
+                    if message.get("method") != "logsNotification":
+                        continue
+                    
+                    result = message["params"]["result"]
+                    last_slot = max(last_slot, result["context"]["slot"])
+                    # 只下载包含create指令日志的成功交易，买卖交易直接丢弃
+                    if result["value"].get("err") is None and PUMP_CREATE_LOG in (result["value"].get("logs") or []):
+                        self.executor.submit(self.handle_stream_signature, rpc, result["value"]["signature"], message)
+                        
+            except websocket.WebSocketTimeoutException:
+                logging.warning(f"WebSocket超过{self.ingest_config['ws_idle_timeout']}秒无消息，订阅可能已断开，重新连接")
+            except Exception as e:
+                if stop and stop.is_set():
+                    break
+                logging.error(f"WebSocket流式采集错误: {str(e)}")
+                if rpc:
+                    self.handle_rpc_error(rpc, str(e))
+                time.sleep(1)
+            finally:
+                if ws:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+
+    def calibrate_slot_clock(self):
+        """用getRecentPerformanceSamples校准出块间隔"""
+        try:
+            response = self.make_rpc_request(self.get_best_rpc(), "getRecentPerformanceSamples", [5])
+            samples = response.json().get("result") if response else None
+            if samples:
+                logging.info(f"出块间隔校准为 {self.slot_clock.calibrate(samples) * 1000:.0f}ms")
+        except Exception as e:
+            logging.warning(f"校准出块间隔失败: {str(e)}")
+
+    def subscribe_slots(self):
+        """通过slotSubscribe接收最新slot，断线后自动重连"""
+        while True:
+            ws = None
+            try:
+                ws_url = self.get_ws_url(self.get_best_rpc())
+                ws = websocket.create_connection(ws_url, timeout=self.ingest_config['ws_idle_timeout'])
+                ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "slotSubscribe"}))
+                if json.loads(ws.recv()).get("result") is None:
+                    raise Exception("slotSubscribe订阅失败")
+                logging.info(f"slotSubscribe订阅成功: {ws_url}")
+                
+                while True:
+                    message = json.loads(ws.recv())
+                    if message.get("method") != "slotNotification":
+                        continue
+                    
+                    # 区块按finalized获取，使用已确认的root slot
+                    root = message["params"]["result"]["root"]
+                    self.slot_clock.observe(root)
+                    with self.slot_cond:
+                        self.streamed_slot = max(self.streamed_slot, root)
+                        self.slot_stream_updated = time.time()
+                        self.slot_cond.notify_all()
+                        
+            except Exception as e:
+                logging.warning(f"slot推送中断，使用轮询: {str(e)}")
+                time.sleep(5)
+            finally:
+                if ws:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+
+    def wait_for_new_slot(self, last_slot):
+        """等待比last_slot更新的slot: 推送可用时等推送，否则在预计出块时刻轮询getSlot"""
+        while True:
+            # slot推送在最近几个slot内有更新时直接等待推送
+            if time.time() - self.slot_stream_updated < self.slot_clock.slot_time * 5:
+                with self.slot_cond:
+                    self.slot_cond.wait_for(lambda: self.streamed_slot > last_slot, timeout=self.slot_clock.slot_time * 2)
+                    if self.streamed_slot > last_slot:
+                        return self.streamed_slot
+                continue
+            
+            delay = self.slot_clock.delay_until_next()
+            if delay > 0:
+                time.sleep(delay)
+            
+            response = self.parallel_rpc_request("getSlot")
+            self.metrics['slot_polls'] += 1
+            if response:
+                slot = response.json()["result"]
+                self.slot_clock.observe(slot)
+                if slot > last_slot:
+                    return slot
+            
+            # 预计时刻未出现新slot，短间隔再查
+            time.sleep(self.slot_clock.slot_time / 8)
 
     def monitor(self):
         """主监控函数"""
         logging.info("监控启动...")
         last_slot = 0
-        self.PUMP_PROGRAM = "6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ35MKDfgCcMKJ"
+        self.PUMP_PROGRAM = PUMP_PROGRAM
+        
+        # WebSocket流式采集模式
+        if self.ingest_config['mode'] == 'logs' and self.monitor_logs() is not False:
+            return
+        
+        # 按程序签名采集模式
+        if self.ingest_config['mode'] == 'signatures':
+            return self.monitor_signatures()
+        
+        # asyncio采集模式
+        if self.ingest_config['mode'] == 'async' and self.monitor_async():
+            return
+        
+        # 按近期出块速度校准slot节奏，有WebSocket时订阅slot推送
+        seen_slot = 0
+        self.calibrate_slot_clock()
+        if websocket is not None:
+            Thread(target=self.subscribe_slots, daemon=True).start()
         
         while True:
             try:
+                # 等到下一个slot出现(slotSubscribe推送或按出块节奏轮询)
+                current_slot = self.wait_for_new_slot(seen_slot)
+                seen_slot = current_slot
                 start_time = time.time()
                 
-                # 并行请求获取当前slot
-                response = self.parallel_rpc_request("getSlot")
-                if not response:
-                    continue
-                    
-                current_slot = response.json()["result"]
-                slots_to_process = range(last_slot + 1, current_slot + 1)
+                if last_slot == 0:
+                    # 从检查点恢复，缺口在后台补采
+                    last_slot, catchup_slots = self.plan_catchup(current_slot)
+                    if catchup_slots:
+                        Thread(target=self.run_catchup, args=(catchup_slots,), daemon=True).start()
                 
-                # 分批处理区块
-                for batch_start in range(0, len(slots_to_process), self.block_batch_size):
-                    batch_slots = slots_to_process[batch_start:batch_start + self.block_batch_size]
-                    
-                    # 并行处理一批区块
-                    with ThreadPoolExecutor(max_workers=self.parallel_requests) as executor:
-                        futures = []
-                        for slot in batch_slots:
-                            future = executor.submit(
-                                self.parallel_rpc_request,
-                                "getBlock",
-                                [slot, {"encoding":"json","transactionDetails":"full"}]
-                            )
-                            futures.append((slot, future))
+                # 只下载实际出块的slot，跳过的slot不再请求
+                slots_to_process, covered_slot = self.get_produced_slots(
+                    self.get_best_rpc(), last_slot + 1, current_slot
+                )
+                
+                # 实时区块下载期间暂停补采
+                self.live_idle.clear()
+                try:
+                    # 分批处理区块
+                    for batch_start in range(0, len(slots_to_process), self.block_batch_size):
+                        batch_slots = slots_to_process[batch_start:batch_start + self.block_batch_size]
                         
-                        # 使用as_completed快速处理结果
-                        for slot, future in futures:
-                            try:
-                                response = future.result()
-                                if response and response.status_code == 200:
-                                    self.tx_queue.put(response.json())
-                                    self.metrics['processed_blocks'] += 1
-                                else:
-                                    self.metrics['missed_blocks'].add(slot)
-                            except Exception as e:
-                                self.metrics['missed_blocks'].add(slot)
-                                logging.error(f"处理区块 {slot} 失败: {str(e)}")
+                        # 以JSON-RPC批量请求并行下载一批区块
+                        self.fetch_slots_batched(batch_slots)
+                finally:
+                    self.live_idle.set()
                 
                 # 记录处理延迟
                 process_time = time.time() - start_time
                 self.metrics['processing_delays'].append(process_time)
                 
-                last_slot = current_slot
-                time.sleep(0.02)  # 减少轮询间隔到20ms
+                last_slot = max(last_slot, covered_slot)
+                self.checkpoint.advance(last_slot)
+                self.checkpoint.save(self.ingest_config['checkpoint_interval'], self.gap_tracker.snapshot())
                 
             except Exception as e:
                 logging.error(f"监控循环错误: {str(e)}")
@@ -1113,7 +4182,7 @@ class TokenMonitor:
                 return False
             
             test_url = 'https://api.mainnet-beta.solana.com'
-            response = requests.get(
+            response = self.http.get(
                 test_url,
                 proxies=proxies,
                 timeout=5,
@@ -1143,7 +4212,7 @@ class TokenMonitor:
             else:
                 logging.debug(f"使用本机网络发送请求: {url}")
             
-            response = requests.get(
+            response = self.http.get(
                 url,
                 headers=headers,
                 proxies=proxies,
@@ -1156,7 +4225,7 @@ class TokenMonitor:
             logging.error(f"代理连接错误: {str(e)}")
             # 代理失败时自动切换到本机网络
             logging.info("自动切换到本机网络重试")
-            return requests.get(url, headers=headers, timeout=timeout)
+            return self.http.get(url, headers=headers, timeout=timeout)
         except Exception as e:
             logging.error(f"请求失败: {str(e)}")
             return None
@@ -1177,7 +4246,7 @@ class TokenMonitor:
             # 获取地址的转入交易
             api_key = self.get_next_api_key()
             url = f"https://public-api.birdeye.so/public/address_activity?address={address}"
-            response = requests.get(url, headers={"X-API-KEY": api_key})
+            response = self.http.get(url, headers={"X-API-KEY": api_key})
             if response.status_code != 200:
                 return []
                 
@@ -1228,10 +4297,14 @@ class TokenMonitor:
 
     def check_address_success_tokens(self, address):
         """检查地址是否创建过成功的代币（市值超过1000万）"""
+        cached = self.get_cached_data('success_tokens', address)
+        if cached is not None:
+            return cached
+        
         try:
             api_key = self.get_next_api_key()
             url = f"https://public-api.birdeye.so/public/token_list?creator={address}"
-            response = requests.get(url, headers={"X-API-KEY": api_key})
+            response = self.http.get(url, headers={"X-API-KEY": api_key})
             if response.status_code != 200:
                 return []
                 
@@ -1251,6 +4324,7 @@ class TokenMonitor:
                         "created_at": token.get("createdAt")
                     })
             
+            self.set_cached_data('success_tokens', address, success_tokens)
             return success_tokens
             
         except Exception as e:
@@ -1259,16 +4333,12 @@ class TokenMonitor:
             return []
 
     def get_cached_data(self, cache_type, key):
-        """获取缓存数据"""
-        if key in self.cache[cache_type]:
-            data, timestamp = self.cache[cache_type][key]
-            if time.time() - timestamp < self.cache_expire[cache_type]:
-                return data
-        return None
+        """获取缓存数据，不存在或已过期时返回None"""
+        return self.cache.get(cache_type, key)
 
     def set_cached_data(self, cache_type, key, data):
         """设置缓存数据"""
-        self.cache[cache_type][key] = (data, time.time())
+        self.cache.set(cache_type, key, data)
 
     def analyze_token(self, mint, creator):
         """并行分析代币信息"""
@@ -1276,13 +4346,14 @@ class TokenMonitor:
             with ThreadPoolExecutor(max_workers=3) as executor:
                 futures = {
                     'token_info': executor.submit(self.fetch_token_info, mint),
-                    'creator_history': executor.submit(self.analyze_creator_history, creator),
-                    'fund_flow': executor.submit(self.trace_fund_flow, creator)
+                    'history': executor.submit(self.analyze_creator_history, creator),
+                    'relations': executor.submit(self.analyze_creator_relations, creator)
                 }
                 
                 results = {
                     key: future.result() for key, future in futures.items()
                 }
+                results.update(creator=creator, mint=mint)
                 
                 return results
         except Exception as e:
@@ -1290,49 +4361,130 @@ class TokenMonitor:
             return None
 
     def fetch_token_info(self, mint):
-        """批量获取代币信息"""
-        cached = self.get_cached_data('token_info', mint)
-        if cached:
-            return cached
+        """批量获取代币信息，同一代币的并发调用共享一次请求
+        
+        名称、符号、供应量等元数据缓存在token_meta，过了TTL但仍在宽限期内时照常使用旧值，
+        并在后台刷新；价格、市值、流动性、持有人等行情字段缓存在token_info，TTL很短且不使用过期值。
+        """
+        cached = self.cache.lookup('token_meta', mint)
+        if cached and cached[1] and not self.inflight.in_flight('token_meta', mint):
+            self.metrics['token_revalidations'] += 1
+            self.refresh_executor.submit(self.inflight.do, 'token_meta', mint, self.request_token_infos, [mint], True)
+        
+        market = self.get_cached_data('token_info', mint)
+        if cached and market is not None:
+            return {**cached[0], **market}
+        
+        return self.inflight.do('token_info', mint, self.request_token_info, mint, check=self.cached_token_info)
+
+    def cached_token_info(self, mint):
+        """元数据(含宽限期内的旧值)和未过期的行情都在缓存中时返回组合后的代币信息，否则返回None"""
+        cached = self.cache.lookup('token_meta', mint)
+        market = self.get_cached_data('token_info', mint)
+        if cached and market is not None:
+            return {**cached[0], **market}
+        return None
+
+    def request_token_info(self, mint):
+        """通过微批处理查询代币信息"""
+        return self.token_batcher.get(mint, timeout=self.birdeye_config['batch_timeout'])
+
+    def request_token_infos(self, mints, metadata=False):
+        """一次multi_tokens请求查询多个代币，结果写入缓存，返回 {mint: 代币信息}
         
+        批内代币的元数据都已缓存(含宽限期内的旧值)且metadata为False时，只请求行情字段。
+        """
         try:
+            metas = {}
+            for mint in mints:
+                cached = None if metadata else self.cache.lookup('token_meta', mint)
+                if not cached:
+                    metadata = True
+                    break
+                metas[mint] = cached[0]
+            
             headers = {"X-API-KEY": self.get_next_api_key()}
             params = {
-                "address": mint,
-                "get_metadata": 1,
+                "address": ",".join(mints),
                 "get_holders": 1,
                 "get_price": 1
             }
+            if metadata:
+                params["get_metadata"] = 1
             
             response = self.make_request(
-                "https://public-api.birdeye.so/public/multi_tokens",
-                headers=headers,
-                params=params
+                f"https://public-api.birdeye.so/public/multi_tokens?{urlencode(params)}",
+                headers=headers
             )
             
             if response and response.status_code == 200:
-                data = response.json()
-                self.set_cached_data('token_info', mint, data)
-                return data
+                items = response.json().get("data") or {}
+                results = {}
+                for mint in mints:
+                    if items.get(mint):
+                        meta, market = self.parse_token_info(items[mint], None if metadata else metas[mint])
+                        if metadata:
+                            self.set_cached_data('token_meta', mint, meta)
+                        self.set_cached_data('token_info', mint, market)
+                        results[mint] = {**meta, **market}
+                return results
             
         except Exception as e:
             logging.error(f"获取代币信息失败: {str(e)}")
-        return None
+        return {}
+
+    def parse_token_info(self, item, meta=None):
+        """把multi_tokens返回的单个代币数据整理为 (元数据, 行情数据)
+        
+        meta为已缓存的元数据时只解析行情字段，市值和持有集中度按缓存的供应量计算。
+        """
+        if meta is None:
+            meta = {
+                "name": item.get("name", "Unknown"),
+                "symbol": item.get("symbol", "Unknown"),
+                "supply": float(item.get("supply") or 0),
+                "verified": item.get("verified", False)
+            }
+        
+        holders = item.get("holders") or []
+        supply = meta["supply"]
+        price = float(item.get("price") or 0)
+        holder_concentration = 0
+        if holders and supply > 0:
+            top_10_holdings = sum(float(h.get("amount", 0)) for h in holders[:10])
+            holder_concentration = (top_10_holdings / supply) * 100
+        
+        market = {
+            "price": price,
+            "market_cap": price * supply,
+            "liquidity": float(item.get("liquidity") or 0),
+            "holder_count": item.get("holder_count", len(holders)),
+            "holder_concentration": holder_concentration
+        }
+        return meta, market
 
     def process_transactions(self):
-        """处理交易队列"""
+        """分析新币事件，结果交给process_results推送
+        
+        result_queue只由本方法消费，每个事件只分析一次。
+        """
         while True:
             try:
-                tx_data = self.tx_queue.get()
+                tx_data = self.result_queue.get()
                 if tx_data is None:
                     break
                     
                 mint, creator = tx_data
                 results = self.analyze_token(mint, creator)
+                if not results or not results['token_info']:
+                    continue
+                
+                token_info = results['token_info']
+                if token_info['market_cap'] < 1000:
+                    logging.info(f"市值过小 (${token_info['market_cap']}), 跳过通知: {mint}")
+                    continue
                 
-                if results and self.should_notify(results):
-                    msg = self.format_alert_message(results)
-                    self.send_notification(msg)
+                self.alert_queue.put(results)
                     
             except Exception as e:
                 logging.error(f"处理交易失败: {str(e)}")
@@ -1444,9 +4596,13 @@ if __name__ == "__main__":
         print("6. 测试资金追踪")
         print("7. 测试代币信息")
         print("8. 测试警报消息")
+        print("9. 回放基准测试")
+        print("10. JSON解码基准测试")
+        print("11. 限速器基准测试")
+        print("12. 共享内存环形缓冲区基准测试")
         print("0. 退出程序")
         
-        choice = input("\n请选择操作 (0-8): ")
+        choice = input("\n请选择操作 (0-12): ")
         
         if choice == '1':
             print("\n开始监控...")
@@ -1497,8 +4653,29 @@ if __name__ == "__main__":
             test_token_info()
         elif choice == '8':
             test_alert_message()
+        elif choice == '9':
+            record_path = input("录制文件路径: ")
+            speed = input("回放倍速 (默认1): ")
+            benchmark_stream_replay(monitor, record_path, float(speed or 1))
+        elif choice == '10':
+            payload_dir = input("区块样本目录 (默认 ~/.solana_pump/blocks): ") or os.path.expanduser("~/.solana_pump/blocks")
+            if not os.path.isdir(payload_dir) or not os.listdir(payload_dir):
+                if input("样本目录为空，是否下载最近20个区块? (y/N): ").lower() == 'y':
+                    save_block_samples(monitor, payload_dir)
+            if os.path.isdir(payload_dir):
+                benchmark_json_decoders(payload_dir)
+                benchmark_decode_pool(payload_dir, backend=monitor.json_decoder.name)
+        elif choice == '11':
+            limits = monitor.request_limits["default"]
+            benchmark_rate_limiter(limits["requests_per_second"], limits["burst"], monitor.parallel_requests)
+            benchmark_rate_limiter(limits["requests_per_second"], limits["burst"], monitor.parallel_requests,
+                                   throttle_at=30, penalty=limits["burst_wait"])
+        elif choice == '12':
+            benchmark_ring_buffer()
         elif choice == '0':
             print("\n退出程序...")
+            if monitor.cache.disk:
+                monitor.cache.disk.flush()
             break
         else:
             print("\n无效的选择，请重试")
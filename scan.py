@@ -1009,6 +1009,13 @@ def save_results(results: List[Dict]):
         avg_latency = sum(r['latency'] for r in results) / len(results)
         f.write(f"平均延迟: {avg_latency:.1f}ms\n")
         # 更多统计...
+    
+    # 同时导出节点列表，供监控程序分片下载区块
+    nodes_file = os.path.expanduser("~/.solana_pump/scan_nodes.txt")
+    os.makedirs(os.path.dirname(nodes_file), exist_ok=True)
+    with open(nodes_file, "w") as f:
+        for res in sorted(results, key=lambda x: x['latency']):
+            f.write(f"{res['http_url']}|{res['latency']:.1f}\n")
 
 def show_menu():
     """显示主菜单"""
@@ -0,0 +1,455 @@
+import json
+import threading
+import time
+import types
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("wcferry")
+import monitor2
+
+
+class BatchLimitHandler(BaseHTTPRequestHandler):
+    """只接受不超过max_batch条的批量请求，更大的批次返回413"""
+    protocol_version = "HTTP/1.1"
+    max_batch = 2
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if isinstance(body, list) and len(body) > self.max_batch:
+            self.send_response(413)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        requests_ = body if isinstance(body, list) else [body]
+        out = [
+            {"jsonrpc": "2.0", "result": {"blockTime": 1, "slot": req["params"][0], "transactions": []}, "id": req["id"]}
+            for req in requests_
+        ]
+        data = json.dumps(out if isinstance(body, list) else out[0], separators=(",", ":")).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def batch_node():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BatchLimitHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def make_monitor(node):
+    """只带批量请求所需属性的TokenMonitor"""
+    monitor = monitor2.TokenMonitor.__new__(monitor2.TokenMonitor)
+    monitor.request_limits = {"default": {"max_batch": 8, "burst_wait": 5}}
+    monitor.http = monitor2.HttpClientPool()
+    monitor.json_decoder = monitor2.JsonDecoder()
+    concurrency = monitor2.AdaptiveConcurrency(limit=8)
+    bucket = monitor2.TokenBucket(1000, 1000)
+    monitor.get_concurrency_limiter = lambda n: concurrency
+    monitor.get_rate_limiter = lambda n: bucket
+    monitor.node_request_done = lambda n, **kwargs: concurrency.release()
+    return monitor
+
+
+def test_split_batch_keeps_raw_bytes(batch_node):
+    monitor = make_monitor(batch_node)
+    params_list = [[slot, {}] for slot in range(100, 108)]
+    results = {}
+
+    monitor._send_rpc_batch(batch_node, "getBlock", params_list, list(range(8)), results, raw=True)
+
+    assert sorted(results) == list(range(8))
+    assert all(isinstance(item, bytes) for item in results.values())
+    assert monitor.request_limits["default"]["max_batch"] <= 4
+
+
+def test_split_batch_decodes_without_raw(batch_node):
+    monitor = make_monitor(batch_node)
+    params_list = [[slot, {}] for slot in range(100, 108)]
+    results = {}
+
+    monitor._send_rpc_batch(batch_node, "getBlock", params_list, list(range(8)), results)
+
+    assert sorted(results) == list(range(8))
+    assert all(isinstance(item, dict) for item in results.values())
+
+
+def test_each_event_analyzed_once_and_formatted():
+    monitor = monitor2.TokenMonitor.__new__(monitor2.TokenMonitor)
+    monitor.result_queue = monitor2.Queue()
+    monitor.alert_queue = monitor2.Queue()
+    calls = []
+    token_info = {
+        "name": "Test", "symbol": "TST", "price": 0.001, "supply": 1_000_000,
+        "market_cap": 5000, "liquidity": 10.0, "holder_count": 3,
+        "holder_concentration": 50.0, "verified": False
+    }
+    monitor.fetch_token_info = lambda mint: calls.append(mint) or token_info
+    monitor.analyze_creator_history = lambda creator: []
+    monitor.analyze_creator_relations = lambda creator: {
+        "wallet_age": 0, "is_new_wallet": True, "related_addresses": [],
+        "relations": [], "watch_hits": [], "high_value_relations": [], "risk_score": 0
+    }
+
+    monitor.result_queue.put(("mint1", "creator1"))
+    monitor.result_queue.put(None)
+    monitor.process_transactions()
+
+    assert calls == ["mint1"]
+    assert monitor.alert_queue.qsize() == 1
+    msg = monitor.format_alert_message(monitor.alert_queue.get())
+    assert "mint1" in msg and msg != "消息格式化失败"
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return {"data": self.data}
+
+
+def test_token_market_fields_not_served_stale():
+    now = [1000.0]
+    monitor = monitor2.TokenMonitor.__new__(monitor2.TokenMonitor)
+    monitor.cache = monitor2.TTLCache({
+        "token_meta": {"ttl": 3600, "max_entries": 10, "max_bytes": 10 ** 6, "stale_grace": 86400},
+        "token_info": {"ttl": 60, "max_entries": 10, "max_bytes": 10 ** 6}
+    }, clock=lambda: now[0])
+    monitor.inflight = monitor2.SingleFlight()
+    monitor.refresh_executor = monitor2.ThreadPoolExecutor(max_workers=1)
+    monitor.metrics = {"token_revalidations": 0}
+    monitor.get_next_api_key = lambda: "key"
+    monitor.request_token_info = lambda mint: monitor.request_token_infos([mint]).get(mint)
+    price = [1.0]
+    urls = []
+
+    def make_request(url, headers=None):
+        urls.append(url)
+        return FakeResponse({"M": {"name": "Test", "symbol": "TST", "supply": 100, "price": price[0]}})
+    monitor.make_request = make_request
+
+    assert monitor.fetch_token_info("M")["market_cap"] == 100
+    assert "get_metadata=1" in urls[-1]
+
+    # 行情过期后重新请求，元数据仍然有效，不再请求
+    now[0] += 61
+    price[0] = 2.0
+    info = monitor.fetch_token_info("M")
+    assert info["market_cap"] == 200 and info["name"] == "Test"
+    assert len(urls) == 2 and "get_metadata" not in urls[-1]
+
+    # 元数据过期但在宽限期内，照常返回并在后台刷新
+    now[0] += 3600
+    price[0] = 3.0
+    assert monitor.fetch_token_info("M")["market_cap"] == 300
+    monitor.refresh_executor.shutdown(wait=True)
+    assert monitor.metrics["token_revalidations"] == 1
+    assert "get_metadata=1" in urls[-1]
+    assert monitor.cache.lookup("token_meta", "M")[1] is False
+
+
+def test_disk_cache_get_not_blocked_by_writer(tmp_path):
+    disk = monitor2.DiskCache(str(tmp_path / "cache.db"), flush_interval=3600)
+    disk.put("token_meta", "M", {"name": "Test"}, time.time(), 60)
+    assert disk.flush() == 1
+
+    # 落盘线程持有写锁(executemany/commit期间)时，读取仍直接返回
+    result = []
+    with disk.lock:
+        reader = threading.Thread(target=lambda: result.append(disk.get("token_meta", "M")))
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+    assert result[0][0] == {"name": "Test"}
+    assert disk.load("token_meta", 10)[0][:2] == ("M", {"name": "Test"})
+    disk.close()
+
+
+class FailingPool:
+    """submit返回带指定异常的Future"""
+    def __init__(self, exc):
+        self.exc = exc
+        self.shutdown_called = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(self.exc)
+        return future
+
+    def shutdown(self, wait=True):
+        self.shutdown_called = True
+
+
+def make_decode_monitor(pool):
+    monitor = monitor2.TokenMonitor.__new__(monitor2.TokenMonitor)
+    monitor.decode_pool = pool
+    monitor.decode_ring = None
+    monitor.json_decoder = monitor2.JsonDecoder()
+    monitor.alt_cache = monitor2.AddressLookupTableCache.__new__(monitor2.AddressLookupTableCache)
+    monitor.metrics = {"pool_decoded_blocks": 0, "pool_fallbacks": 0}
+    return monitor
+
+
+def test_block_error_keeps_decode_pool():
+    pool = FailingPool(json.JSONDecodeError("truncated", "", 0))
+    monitor = make_decode_monitor(pool)
+    raw = b'{"result":{"transactions":[]},"x":"' + monitor2.PUMP_PROGRAM_BYTES + b'"}'
+
+    assert monitor.decode_block(raw)[0] == []
+    assert monitor.decode_pool is pool and not pool.shutdown_called
+
+
+def test_broken_pool_falls_back_to_threads():
+    pool = FailingPool(monitor2.BrokenProcessPool("worker died"))
+    monitor = make_decode_monitor(pool)
+    raw = b'{"result":{"transactions":[]},"x":"' + monitor2.PUMP_PROGRAM_BYTES + b'"}'
+
+    monitor.decode_block(raw)
+    assert monitor.decode_pool is None and pool.shutdown_called
+
+
+class StopLoop(BaseException):
+    pass
+
+
+def test_signature_poll_retries_missing_transactions(monkeypatch):
+    monitor = monitor2.TokenMonitor.__new__(monitor2.TokenMonitor)
+    monitor.ingest_config = {"poll_interval": 0, "retry_max_attempts": 3, "max_signature_backlog": 100}
+    monitor.metrics = {"processing_delays": []}
+    monitor.alt_cache = types.SimpleNamespace(resolve=None)
+    monitor.get_best_rpc = lambda: "rpc"
+    monitor.get_next_proxy = lambda: None
+    polls = [[{"signature": "A"}], [{"signature": "C"}, {"signature": "B"}], [], []]
+    monitor.fetch_new_signatures = lambda rpc, last: polls.pop(0)
+    fetched = []
+
+    def batch(rpc, method, params_list, proxy=None):
+        # 第一次批量请求中C没有结果，第二次才返回
+        sigs = [params[0] for params in params_list]
+        fetched.append(sigs)
+        return {i: {"result": {"sig": sig}} for i, sig in enumerate(sigs) if len(fetched) > 1 or sig != "C"}
+    monitor.make_batch_rpc_request = batch
+    emitted = []
+    monitor.emit_event = lambda mint, creator: emitted.append(mint)
+    monkeypatch.setattr(monitor2, "decode_pump_creates", lambda tx, resolver=None: [(tx["sig"], "creator")])
+
+    def sleep(seconds):
+        if not polls:
+            raise StopLoop()
+    monkeypatch.setattr(monitor2.time, "sleep", sleep)
+
+    with pytest.raises(StopLoop):
+        monitor.monitor_signatures()
+
+    assert fetched == [["B", "C"], ["C"]]
+    assert emitted == ["B", "C"]
+
+
+def make_probe_monitor(nodes):
+    monitor = monitor2.TokenMonitor.__new__(monitor2.TokenMonitor)
+    monitor.rpc_nodes = {node: {"weight": 1, "fails": 0, "last_used": 0} for node in nodes}
+    monitor.node_health = {}
+    monitor.ranked_nodes = ()
+    monitor.current_rpc = None
+    monitor.health_lock = threading.Lock()
+    monitor.max_fails = 3
+    monitor.max_slot_lag = 30
+    monitor.probe_executor = monitor2.ThreadPoolExecutor(max_workers=4)
+    return monitor
+
+
+def test_probe_does_not_reset_block_failures():
+    monitor = make_probe_monitor(["good", "bad"])
+    monitor.probe_node = lambda node: (100, 0.01 if node == "bad" else 0.05)
+    monitor.probe_once()
+    assert monitor.ranked_nodes[0] == "bad"
+
+    # bad节点能应答getSlot，但getBlock一直失败
+    for _ in range(3):
+        monitor.handle_rpc_error("bad", "getBlock failed")
+    monitor.probe_once()
+
+    assert monitor.rpc_nodes["bad"]["fails"] == 3
+    assert monitor.ranked_nodes == ("good", "bad")
+
+
+def test_probe_skips_node_without_tokens():
+    monitor = make_probe_monitor(["idle", "limited"])
+    buckets = {"idle": monitor2.TokenBucket(10, 10), "limited": monitor2.TokenBucket(10, 10)}
+    buckets["limited"].penalize(30)
+    monitor.get_rate_limiter = lambda node: buckets[node]
+    monitor.get_next_proxy = lambda: None
+    monitor.http = types.SimpleNamespace(post=lambda node, **kwargs: types.SimpleNamespace(json=lambda: {"result": 100}))
+
+    start = time.time()
+    monitor.probe_once()
+
+    assert time.time() - start < 1
+    assert monitor.node_health["idle"]["slot"] == 100
+    assert "limited" not in monitor.node_health
+
+
+def test_slow_batch_does_not_block_later_lookups():
+    release = threading.Event()
+
+    def fetch(keys):
+        if "slow" in keys:
+            release.wait(5)
+        return {key: key.upper() for key in keys}
+
+    batcher = monitor2.MicroBatcher(fetch, max_batch=1, max_wait=0, workers=2)
+    slow = threading.Thread(target=batcher.get, args=("slow", 10))
+    slow.start()
+    time.sleep(0.05)
+
+    start = time.time()
+    assert batcher.get("fast", timeout=2) == "FAST"
+    assert time.time() - start < 1
+    release.set()
+    slow.join()
+
+
+def test_singleflight_rechecks_cache_after_taking_leadership():
+    flight = monitor2.SingleFlight()
+    cache = {}
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        cache[key] = "value"
+        return "value"
+
+    # 调用方查缓存未命中，此时上一个执行者刚写入缓存并结束
+    assert cache.get("k") is None
+    flight.do("ns", "k", fetch, "k")
+    assert flight.do("ns", "k", fetch, "k", check=cache.get) == "value"
+
+    assert calls == ["k"]
+    assert flight.stats["ns"] == {"calls": 1, "shared": 0, "cached": 1}
+
+
+def make_hedge_monitor(responses):
+    """responses: {节点: (延迟秒数, 状态码或None)}，状态码为None表示请求失败"""
+    monitor = make_probe_monitor(list(responses))
+    monitor.ranked_nodes = tuple(responses)
+    monitor.current_rpc = monitor.ranked_nodes[0]
+    monitor.get_best_rpc = lambda: monitor.ranked_nodes[0]
+    monitor.get_next_proxy = lambda: None
+    monitor.ingest_config = {"hedge_max": 2, "hedge_default_delay": 0.05}
+    monitor.latency_stats = monitor2.LatencyStats()
+    monitor.hedge_executor = monitor2.ThreadPoolExecutor(max_workers=4)
+    monitor.metrics = {"hedge_requests": 0, "hedge_sent": 0, "hedge_wins": 0, "hedge_wasted": 0}
+
+    def request(node, method, params=None, proxy=None):
+        delay, status = responses[node]
+        time.sleep(delay)
+        return types.SimpleNamespace(status_code=status) if status else None
+    monitor.make_rpc_request = request
+    return monitor
+
+
+def test_hedge_wasted_counts_only_discarded_successes():
+    monitor = make_hedge_monitor({"primary": (0.3, 200), "backup": (0.01, 200)})
+    assert monitor.parallel_rpc_request("getSlot").status_code == 200
+    monitor.hedge_executor.shutdown(wait=True)
+    assert monitor.metrics["hedge_wins"] == 1 and monitor.metrics["hedge_wasted"] == 1
+
+    monitor = make_hedge_monitor({"primary": (0.3, None), "backup": (0.01, 200)})
+    assert monitor.parallel_rpc_request("getSlot").status_code == 200
+    monitor.hedge_executor.shutdown(wait=True)
+    assert monitor.metrics["hedge_wasted"] == 0
+
+
+def test_shard_keeps_node_after_single_failure():
+    monitor = make_probe_monitor(["a", "b"])
+    monitor.parallel_requests = 4
+    monitor.request_limits = {"default": {"max_batch": 10}}
+    monitor.metrics = {"processed_blocks": 0}
+    monitor.get_next_proxy = lambda: None
+    monitor.node_capacity = lambda node: 1
+    monitor.record_block_result = lambda slot, data: data is not None
+    enqueued = []
+    monitor.enqueue_block = lambda slot, data, priority=0: enqueued.append(slot)
+    calls = []
+
+    def fetch_blocks(node, slots, proxy=None, commitment=None):
+        calls.append((node, list(slots)))
+        blocks = {slot: b"{}" for slot in slots}
+        if len(calls) <= 2 and 100 in slots:
+            del blocks[100]                                           # 一次临时错误
+        if 101 in slots:
+            blocks[101] = {"error": {"code": -32007, "message": "skipped"}}  # slot被跳过
+        return blocks
+    monitor.fetch_blocks = fetch_blocks
+    rounds = []
+    assign_shards = monitor.assign_shards
+    monitor.assign_shards = lambda slots, nodes: rounds.append(list(nodes)) or assign_shards(slots, nodes)
+
+    monitor.fetch_slots_sharded(list(range(100, 104)), ["a", "b"])
+
+    assert sorted(enqueued) == [100, 101, 102, 103]
+    assert rounds == [["a", "b"], ["a", "b"]]
+
+
+def test_http_pool_stats_are_per_interval(batch_node):
+    pool = monitor2.HttpClientPool()
+    body = {"jsonrpc": "2.0", "id": 1, "method": "getBlock", "params": [1]}
+    for _ in range(3):
+        pool.post(batch_node, json=body)
+    first = pool.stats()[batch_node]
+    for _ in range(2):
+        pool.post(batch_node, json=body)
+    second = pool.stats()[batch_node]
+
+    assert first["requests"] == 3 and first["connections"] == 1
+    assert second["requests"] == 2 and second["connections"] == 0
+    assert second["reuse"] == 1
+
+
+def make_create_block(count=3):
+    """生成包含count笔Pump create交易和若干普通交易的getBlock响应"""
+    data = monitor2.b58encode(monitor2.PUMP_CREATE_DISCRIMINATOR + b"x" * 40)
+    txs = []
+    for i in range(count):
+        keys = [monitor2.b58encode((1000 + i * 10 + j).to_bytes(32, "big")) for j in range(8)] + [monitor2.PUMP_PROGRAM]
+        message = {"accountKeys": keys, "instructions": [{"programIdIndex": 8, "accounts": list(range(8)), "data": data}]}
+        txs.append({"meta": {"err": None, "innerInstructions": []}, "transaction": {"message": message, "signatures": ["s"]}})
+        txs.append({"meta": {"err": None}, "transaction": {"message": {"accountKeys": ["other"], "instructions": []}, "signatures": ["s"]}})
+    return json.dumps({"jsonrpc": "2.0", "result": {"transactions": txs}, "id": 1}).encode()
+
+
+@pytest.mark.parametrize("backend", monitor2.JsonDecoder.available_backends())
+def test_ring_record_decodes_without_copy(backend):
+    raw = make_create_block()
+    ring = monitor2.SharedRingBuffer(1024 * 1024)
+    try:
+        ring.write(b"padding")
+        pos = ring.write(raw)
+        record = ring.record(pos)
+
+        assert len(record) == len(raw)
+        assert record.find(monitor2.PUMP_PROGRAM_BYTES) == raw.find(monitor2.PUMP_PROGRAM_BYTES)
+        assert record.rfind(b'{"meta":', 0, 500) == raw.rfind(b'{"meta":', 0, 500)
+        assert isinstance(record[0:10], memoryview)
+
+        decoder = monitor2.JsonDecoder(backend)
+        events, decoded = monitor2.extract_block_events(record, decoder)
+        assert (events, decoded) == monitor2.extract_block_events(raw, decoder)
+        assert len(events) == 3
+        record.release()
+    finally:
+        ring.close()